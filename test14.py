@@ -1,27 +1,1039 @@
 # ====== IGLOO AI Model Hub v2.0 ======
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 from datetime import datetime
 import math
 import uuid
 import base64
 import os
+import sqlite3
+import threading
+import hashlib
+import tempfile
+import re
+import bisect
+import html
+import codecs
+import zipfile
+import shutil
+import secrets
+import hmac
+import io
+import gzip
+import zlib
+import itertools
+import struct
+import atexit
+from urllib.parse import urlencode, urlsplit, parse_qs, quote, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from contextlib import contextmanager
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import zstandard as zstd   # 선택 의존성 — 없으면 gzip 으로 압축
+except ImportError:
+    zstd = None
 
 st.set_page_config(page_title="IGLOO AI Model Hub", page_icon=r"D:\Work\16. 모델 팩토리\2.code\photo\page_icon.png", layout="wide")
 
 # ===== 사용자 설정 =====
 PROFILE_ICON_PATH = ""
+DATA_DIR = os.environ.get("HUB_DATA_DIR", "hub_data")
+DB_PATH = os.path.join(DATA_DIR, "hub.db")
+BLOB_DIR = os.path.join(DATA_DIR, "blobs")
+DRAFT_MAX_BYTES = 2 * 1024 * 1024   # 세션당 JSON 편집 초안(패치) 상한
+FILE_PORT = int(os.environ.get("HUB_FILE_PORT", "8510"))   # 내보내기/다운로드용 보조 HTTP 서버 포트 (0 이면 사용 안 함)
+FILE_URL = os.environ.get("HUB_FILE_URL", "")              # 프록시 뒤라면 외부에서 보이는 주소 (기본: 접속 호스트:FILE_PORT)
+BLOB_CODEC = os.environ.get("HUB_BLOB_CODEC") or ("zstd" if zstd else "gzip")   # 아티팩트 저장 압축 (raw 면 끔)
+DOWNLOAD_INLINE_MAX = 32 * 1024 * 1024   # 이보다 큰 모델 파일은 보조 서버에서 스트리밍 (Streamlit 메모리를 거치지 않음)
+COUNTER_FLUSH = float(os.environ.get("HUB_COUNTER_FLUSH", "2"))   # 조회/다운로드 카운터를 DB 에 모아 쓰는 주기(초)
+VIEW_WINDOW = int(os.environ.get("HUB_VIEW_WINDOW", "1800"))      # 같은 조회자가 이 시간(초) 안에 다시 보면 조회수로 세지 않음
+
+# ===== 영구 저장소 (SQLite WAL, 재시작 후에도 유지) =====
+_MODEL_COLS = ('name', 'model_id', 'status', 'log_type', 'type', 'algorithm', 'created_at', 'updated_at')
+_MODEL_ORDERS = {'updated_at', 'created_at', 'downloads', 'views', 'name', 'id', 'relevance'}
+_SEARCH_FIELDS = ('name', 'summary', 'description', 'log_type', 'algorithm', 'detection_target', 'threat_tags')
+_BM25_BOOST = {'name': 4.0, 'threat_tags': 3.0, 'summary': 2.0, 'description': 1.0}
+_TOKEN_RE = re.compile(r'[0-9a-z]+|[가-힣]+')
+
+def _tokens(text):
+    """영문/숫자는 단어 단위, 한글은 띄어쓰기·조사와 무관하게 찾을 수 있도록 음절 1-gram + 2-gram 으로 분해합니다."""
+    out = []
+    for w in _TOKEN_RE.findall(str(text).lower()):
+        if w[0] < '가': out.append(w)
+        else: out += list(w) + [w[i:i+2] for i in range(len(w) - 1)]
+    return out
+
+def _field_text(m, f):
+    v = m.get(f, '')
+    return " ".join(map(str, v)) if isinstance(v, (list, tuple)) else str(v or '')
+
+class BlobStore:
+    """업로드 아티팩트를 SHA-256(원본 내용 기준) 이름으로 디스크에 저장합니다. 내용이 같으면 파일은 하나만 남습니다.
+    압축이 잘 되는 내용은 <sha>.zst / <sha>.gz 로 저장하고, 파일 확장자가 곧 아티팩트별 코덱 표시입니다."""
+    CHUNK = 1 << 20
+    EXT = {'raw': '', 'zstd': '.zst', 'gzip': '.gz'}
+
+    def __init__(self, root, codec=BLOB_CODEC):
+        self.root, self.codec = root, codec
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, sha, codec='raw'):
+        return os.path.join(self.root, sha[:2], sha + self.EXT[codec])
+
+    def locate(self, sha):
+        """(저장 경로, 코덱) — 없으면 (None, None)"""
+        for c in self.EXT:
+            if os.path.exists(self.path(sha, c)): return self.path(sha, c), c
+        return None, None
+
+    def exists(self, sha):
+        return self.locate(sha)[0] is not None
+
+    def stat(self, sha):
+        """(코덱, 디스크에 저장된 바이트 수)"""
+        p, c = self.locate(sha)
+        return c, os.path.getsize(p)
+
+    def _chunks(self, src):
+        if isinstance(src, (bytes, bytearray, memoryview)):
+            mv = memoryview(src)
+            for i in range(0, len(mv), self.CHUNK): yield mv[i:i + self.CHUNK]
+            return
+        if hasattr(src, 'seek'): src.seek(0)
+        while True:
+            b = src.read(self.CHUNK)
+            if not b: break
+            yield b
+
+    @staticmethod
+    def _compressor(codec):
+        if codec == 'zstd': return zstd.ZstdCompressor(level=3).compressobj()
+        return zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits=31 → gzip 형식 (HTTP Content-Encoding 으로 그대로 전송 가능)
+
+    def put(self, src):
+        """bytes 또는 file-like 를 청크 단위로 해시하며 기록하고 (sha256, size) 를 돌려줍니다.
+        첫 청크를 빠르게 압축해 봐서 10% 이상 줄어들 때만 압축 저장합니다 (이미 압축된 바이너리는 그대로)."""
+        h, n = hashlib.sha256(), 0
+        it = self._chunks(src)
+        first = next(it, b'')
+        codec = self.codec if self.codec != 'raw' and len(first) >= 512 and len(zlib.compress(first, 1)) < len(first) * 0.9 else 'raw'
+        co = self._compressor(codec) if codec != 'raw' else None
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".up-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for b in itertools.chain([first], it):
+                    h.update(b); n += len(b)
+                    f.write(co.compress(b) if co else b)
+                if co: f.write(co.flush())
+            sha = h.hexdigest()
+            if self.exists(sha):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(self.path(sha)), exist_ok=True)
+                os.replace(tmp, self.path(sha, codec))
+        except BaseException:
+            if os.path.exists(tmp): os.remove(tmp)
+            raise
+        return sha, n
+
+    def open(self, sha):
+        """원본 내용을 스트리밍으로 읽는 파일 객체 (압축 저장분은 읽으면서 풂)"""
+        p, c = self.locate(sha)
+        if p is None: raise FileNotFoundError(sha)
+        if c == 'gzip': return gzip.open(p, 'rb')
+        if c == 'zstd':
+            if zstd is None: raise RuntimeError("zstd 로 저장된 아티팩트입니다 — zstandard 패키지를 설치하세요")
+            return zstd.ZstdDecompressor().stream_reader(open(p, 'rb'), closefd=True)
+        return open(p, 'rb')
+
+    def read(self, sha):
+        with self.open(sha) as f: return f.read()
+
+    def remove(self, sha):
+        for c in self.EXT:
+            try: os.remove(self.path(sha, c))
+            except FileNotFoundError: pass
+
+# ----- 바이너리 델타 (내용 기반 청크) -----
+_CDC_W, _CDC_MASK, _CDC_MIN, _CDC_MAX = 16, (1 << 13) - 1, 2048, 1 << 16
+
+def _cdc_cuts(buf):
+    """청크 경계 후보 — 16바이트 창 다항 해시의 하위 13비트가 0 인 위치 (평균 8KB). numpy 로 버퍼 전체를 한 번에 계산."""
+    a = np.frombuffer(buf, np.uint8).astype(np.uint32)
+    n = len(a) - _CDC_W + 1
+    if n <= 0: return []
+    h = np.zeros(n, np.uint32)
+    for j in range(_CDC_W): h = h * np.uint32(0x01000193) + a[j:j + n]
+    return (np.flatnonzero((h & _CDC_MASK) == 0) + _CDC_W).tolist()
+
+def _cdc_chunks(f):
+    """파일 → (오프셋, 청크) 스트림. 경계가 내용으로 정해지므로 앞에 바이트가 끼어들어도 뒤쪽 청크는 그대로 일치합니다."""
+    off, buf = 0, b''
+    while True:
+        more = f.read(BlobStore.CHUNK)
+        buf += more
+        start = 0
+        for c in _cdc_cuts(buf) + ([] if more else [len(buf)]):
+            while c - start > _CDC_MAX:
+                yield off + start, buf[start:start + _CDC_MAX]; start += _CDC_MAX
+            if c - start >= _CDC_MIN or (not more and c == len(buf) and c > start):
+                yield off + start, buf[start:c]; start = c
+        while more and len(buf) - start > _CDC_MAX:   # 경계 후보가 없는 구간은 최대 크기로 자름
+            yield off + start, buf[start:start + _CDC_MAX]; start += _CDC_MAX
+        off, buf = off + start, buf[start:]
+        if not more: return
+
+def make_delta(base, target, out):
+    """base 대비 target 델타를 out 에 기록합니다. 'C'(base 오프셋, 길이) 복사와 'I'(길이, 바이트) 삽입 명령의 나열."""
+    dg = lambda b: hashlib.blake2b(b, digest_size=16).digest()
+    idx = {}
+    for o, c in _cdc_chunks(base): idx.setdefault(dg(c), (o, len(c)))
+    out.write(b'HDL1')
+    cp = None   # 이어지는 복사는 하나로 합침
+    for _, c in _cdc_chunks(target):
+        hit = idx.get(dg(c))
+        if hit and cp and cp[0] + cp[1] == hit[0]:
+            cp = (cp[0], cp[1] + hit[1]); continue
+        if cp: out.write(b'C' + struct.pack('<QI', *cp))
+        cp = hit
+        if not hit: out.write(b'I' + struct.pack('<I', len(c)) + c)
+    if cp: out.write(b'C' + struct.pack('<QI', *cp))
+
+def apply_delta(base, delta, out):
+    """make_delta 의 역 — base 는 seek 가능해야 합니다."""
+    if delta.read(4) != b'HDL1': raise ValueError("델타 형식이 아닙니다")
+    while op := delta.read(1):
+        if op == b'C':
+            o, n = struct.unpack('<QI', delta.read(12)); base.seek(o)
+            while n > 0:
+                b = base.read(min(n, BlobStore.CHUNK)); out.write(b); n -= len(b)
+                if not b: raise ValueError("델타 기준 파일이 짧습니다")
+        elif op == b'I':
+            out.write(delta.read(struct.unpack('<I', delta.read(4))[0]))
+        else:
+            raise ValueError("알 수 없는 델타 명령")
+
+def _bitmap(ids):
+    """id 집합 → 비트맵(int). bit i 가 1 이면 id i 포함."""
+    if not ids: return 0
+    ba = bytearray((max(ids) >> 3) + 1)
+    for i in ids: ba[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(ba, 'little')
+
+def _bit_ids(b):
+    """비트맵 → 오름차순 id 리스트."""
+    return [x.start() for x in re.finditer('1', bin(b)[:1:-1])]
+
+class ModelIndex:
+    """id / model_id(외부 식별자) → 레코드 해시 인덱스. CatalogStore 가 등록·수정·삭제 때 put/remove 로 동기화합니다."""
+
+    def __init__(self):
+        self.by_id, self.by_mid = {}, {}
+        self.rev = {}  # id → revision (수정·카운터 변경마다 새 값, 렌더 캐시 키에 사용)
+        self.seq = itertools.count(1)   # 전역 단조 증가 — 삭제된 id 가 재사용돼도 이전 revision 과 겹치지 않음
+
+    def put(self, m, old=None):
+        if old and old.get('model_id') != m.get('model_id'): self.by_mid.pop(old.get('model_id'), None)
+        self.by_id[m['id']] = m
+        self.rev[m['id']] = next(self.seq)
+        if m.get('model_id'): self.by_mid[m['model_id']] = m['id']
+
+    def remove(self, old):
+        self.by_id.pop(old['id'], None)
+        self.rev.pop(old['id'], None)
+        if self.by_mid.get(old.get('model_id')) == old['id']: del self.by_mid[old['model_id']]
+
+class BitmapIndex:
+    """status / log_type / type / threat_tags 값별 id 비트맵. 복합 필터는 값 간 OR, 필드 간 AND 로 계산합니다."""
+    FIELDS = ('status', 'log_type', 'type', 'threat_tags')
+
+    def __init__(self):
+        self.bm = {f: {} for f in self.FIELDS}
+        self.all = 0
+
+    @staticmethod
+    def _values(m, f):
+        v = m.get(f, 'active' if f == 'status' else '')
+        return set(v) if isinstance(v, (list, tuple)) else {v}
+
+    def _clear(self, old, keep=None):
+        bit = 1 << old['id']
+        for f in self.FIELDS:
+            for v in self._values(old, f) - (self._values(keep, f) if keep else set()):
+                b = self.bm[f].get(v, 0) & ~bit
+                if b: self.bm[f][v] = b
+                else: self.bm[f].pop(v, None)
+
+    def put(self, m, old=None):
+        if old: self._clear(old, keep=m)
+        bit = 1 << m['id']
+        for f in self.FIELDS:
+            for v in self._values(m, f): self.bm[f][v] = self.bm[f].get(v, 0) | bit
+        self.all |= bit
+
+    def remove(self, old):
+        self._clear(old)
+        self.all &= ~(1 << old['id'])
+
+    def facets(self, base, statuses=None, log_types=None, types=None, threats=None):
+        """필드별 값 → 건수. 각 필드는 자기 자신의 선택을 제외한 나머지 조건으로 셉니다(선택지를 넓힐 수 있도록)."""
+        keys = ('statuses', 'log_types', 'types', 'threats')
+        sel = dict(zip(keys, (statuses, log_types, types, threats)))
+        out = {}
+        for f, k in zip(self.FIELDS, keys):
+            b = base & self.query(**{**sel, k: None})
+            out[f] = {v: n for v, bm in self.bm[f].items() if (n := (b & bm).bit_count())}
+        return out
+
+    def query(self, statuses=None, log_types=None, types=None, threats=None):
+        """None 인 조건은 무시, 빈 리스트는 결과 없음."""
+        b = self.all
+        for f, vals in (('status', statuses), ('log_type', log_types), ('type', types), ('threat_tags', threats)):
+            if vals is None: continue
+            u = 0
+            for v in vals: u |= self.bm[f].get(v, 0)
+            b &= u
+        return b
+
+class OrderIndex:
+    """정렬 키별 (값, id) 오름차순 리스트. 등록·수정·삭제와 카운터 증가 때 bisect 로 제자리 갱신합니다."""
+    KEYS = {'updated_at': '', 'created_at': '', 'downloads': 0, 'views': 0, 'name': ''}
+
+    def __init__(self):
+        self.lists = {k: [] for k in self.KEYS}
+
+    def key(self, m, k):
+        return (m.get(k) or self.KEYS[k], m['id'])
+
+    def put(self, m, old=None):
+        for k, lst in self.lists.items():
+            nk = self.key(m, k)
+            if old:
+                ok = self.key(old, k)
+                if ok == nk: continue
+                del lst[bisect.bisect_left(lst, ok)]
+            bisect.insort(lst, nk)
+
+    def remove(self, old):
+        for k, lst in self.lists.items():
+            del lst[bisect.bisect_left(lst, self.key(old, k))]
+
+    def walk(self, order, desc, bits, offset=0, limit=None, after=None, before=None):
+        """정렬 순서대로 걸으며 비트맵에 포함된 id 만 모아 offset+limit 개가 차면 멈춥니다.
+        after/before 커서((값, id))가 있으면 bisect 로 그 위치부터 시작하므로 깊은 페이지도 첫 페이지와 비용이 같습니다."""
+        bb = bits.to_bytes((bits.bit_length() + 7) >> 3, 'little')
+        n, out = len(bb), []
+        lst = self.lists[order]
+        if before is not None: desc, after = not desc, before  # 이전 페이지: 커서에서 반대 방향으로 걸은 뒤 뒤집음
+        if after is None: pos = range(len(lst) - 1, -1, -1) if desc else range(len(lst))
+        elif desc: pos = range(bisect.bisect_left(lst, tuple(after)) - 1, -1, -1)
+        else: pos = range(bisect.bisect_right(lst, tuple(after)), len(lst))
+        for p in pos:
+            i = lst[p][1]
+            if (i >> 3) < n and bb[i >> 3] >> (i & 7) & 1:
+                if offset: offset -= 1; continue
+                out.append(i)
+                if limit is not None and len(out) >= limit: break
+        return out[::-1] if before is not None else out
+
+class RecentIndex:
+    """홈 화면 Recently Added / Updated 용 active 모델 top-K (created_at, updated_at).
+    top-K 밖으로 빠지는 항목이 생기면 다음 조회 때 refill(OrderIndex 역순 walk)로 다시 채웁니다."""
+    KEYS, K = ('created_at', 'updated_at'), 12
+
+    def __init__(self, refill):
+        self.refill = refill
+        self.top = {k: [] for k in self.KEYS}  # (값, id) 내림차순
+        self.stale = set()
+
+    def _entry(self, m, k):
+        return (m.get(k) or '', m['id']) if m and m.get('status', 'active') == 'active' else None
+
+    def put(self, m, old=None):
+        for k in self.KEYS:
+            e, o, top = self._entry(m, k), self._entry(old, k), self.top[k]
+            if e == o: continue
+            if o in top:
+                # 꽉 찬 top-K 에서 빠지면 K+1 번째를 모르므로 다음 조회 때 다시 채움
+                if len(top) >= self.K: self.stale.add(k)
+                top.remove(o)
+            if e and (len(top) < self.K or e > top[-1]):
+                top.append(e); top.sort(reverse=True)
+                del top[self.K:]
+
+    def remove(self, old):
+        self.put({'id': old['id'], 'status': None}, old)
+
+    def get(self, k, n):
+        if k in self.stale:
+            self.top[k] = self.refill(k, self.K); self.stale.discard(k)
+        return [i for _, i in self.top[k][:n]]
+
+class TextIndex:
+    """Models 검색창용 역색인. posting(term → id 집합)과 BM25 용 필드별 term 통계(tf, 필드 길이)를 함께 유지합니다.
+    질의 비용은 카탈로그 크기가 아니라 건드리는 posting 수에 비례합니다."""
+    K1, B = 1.2, 0.75
+
+    def __init__(self):
+        self.post, self.doc_terms, self.flen = {}, {}, {}
+        self.flen_sum = dict.fromkeys(_SEARCH_FIELDS, 0)
+        self._vocab = None  # 접두어 확장용 정렬 어휘 (변경 시 지연 재생성)
+
+    def put(self, m, old=None):
+        tf, fl = {}, {}
+        for f in _SEARCH_FIELDS:
+            toks = _tokens(_field_text(m, f))
+            fl[f] = len(toks)
+            for t in toks:
+                d = tf.setdefault(t, {}); d[f] = d.get(f, 0) + 1
+        prev = self.doc_terms.get(m['id'], {})
+        for t in prev.keys() - tf.keys():
+            ids = self.post[t]; ids.discard(m['id'])
+            if not ids: del self.post[t]; self._vocab = None
+        for t in tf.keys() - prev.keys():
+            if t not in self.post: self.post[t] = set(); self._vocab = None
+            self.post[t].add(m['id'])
+        for f, n in self.flen.get(m['id'], {}).items(): self.flen_sum[f] -= n
+        for f, n in fl.items(): self.flen_sum[f] += n
+        self.doc_terms[m['id']], self.flen[m['id']] = tf, fl
+
+    def remove(self, old):
+        self.put({'id': old['id']})
+        self.doc_terms.pop(old['id'], None); self.flen.pop(old['id'], None)
+
+    @staticmethod
+    def _query_tokens(q):
+        toks = []
+        for w in _TOKEN_RE.findall(str(q).lower()):
+            if w[0] < '가': toks.append(w)
+            else: toks += [w] if len(w) == 1 else [w[i:i+2] for i in range(len(w) - 1)]
+        return list(dict.fromkeys(toks))
+
+    def _expand(self, tok):
+        # 영문 토큰은 접두어 일치(inj → injection), 한글 n-gram 은 정확 일치
+        if tok[0] >= '가': return [tok] if tok in self.post else []
+        if self._vocab is None: self._vocab = sorted(self.post)
+        i, out = bisect.bisect_left(self._vocab, tok), []
+        while i < len(self._vocab) and self._vocab[i].startswith(tok):
+            out.append(self._vocab[i]); i += 1
+        return out
+
+    def search(self, q):
+        """질의의 모든 토큰을 포함하는 id 집합 (토큰 간 AND, 접두어 확장은 OR)."""
+        toks = self._query_tokens(q)
+        if not toks: return set()
+        sets = []
+        for t in toks:
+            hit = set().union(*[self.post[x] for x in self._expand(t)])
+            if not hit: return set()
+            sets.append(hit)
+        sets.sort(key=len)
+        return sets[0].intersection(*sets[1:])
+
+    def score(self, ids, q):
+        """후보 ids 의 BM25F 점수. 필드 가중치는 _BM25_BOOST (name > threat_tags > summary > description)."""
+        n = len(self.flen) or 1
+        avg = {f: (self.flen_sum[f] / n) or 1 for f in _SEARCH_FIELDS}
+        sc = dict.fromkeys(ids, 0.0)
+        for t in self._query_tokens(q):
+            for x in self._expand(t):
+                df = len(self.post[x])
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for i in ids:
+                    ftf = self.doc_terms[i].get(x)
+                    if not ftf: continue
+                    fl = self.flen[i]
+                    w = sum(_BM25_BOOST.get(f, 1.0) * c / (1 - self.B + self.B * fl[f] / avg[f]) for f, c in ftf.items())
+                    sc[i] += idf * w * (self.K1 + 1) / (w + self.K1)
+        return sc
+
+class CatalogStore:
+    """models / model_files / feedback / docs 를 SQLite 에 보관하는 얇은 저장소 API.
+    레코드 전체는 JSON(doc) 으로, 필터·정렬에 쓰는 필드는 인덱스 컬럼으로 함께 저장합니다."""
+
+    def __init__(self, path, blobs):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.blobs = blobs
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS models(
+                id INTEGER PRIMARY KEY, model_id TEXT UNIQUE, name TEXT, status TEXT, log_type TEXT, type TEXT,
+                algorithm TEXT, created_at TEXT, updated_at TEXT, downloads INTEGER DEFAULT 0, views INTEGER DEFAULT 0,
+                doc TEXT);
+            -- 필터·정렬은 메모리 인덱스(BitmapIndex/OrderIndex)가 맡으므로 SQL 보조 인덱스는 두지 않음 (이전 DB 에서 정리)
+            DROP INDEX IF EXISTS ix_models_status_upd; DROP INDEX IF EXISTS ix_models_status_crt;
+            DROP INDEX IF EXISTS ix_models_log_type; DROP INDEX IF EXISTS ix_models_type;
+            DROP INDEX IF EXISTS ix_models_downloads; DROP INDEX IF EXISTS ix_models_views; DROP INDEX IF EXISTS ix_models_name;
+            DROP TABLE IF EXISTS model_threats;
+            CREATE TABLE IF NOT EXISTS model_files(mid INTEGER PRIMARY KEY, filename TEXT, type TEXT, sha256 TEXT, size INTEGER, codec TEXT DEFAULT 'raw', stored INTEGER);
+            CREATE TABLE IF NOT EXISTS feedback(
+                id INTEGER PRIMARY KEY AUTOINCREMENT, model_id INTEGER, model_name TEXT, rating INTEGER,
+                feedback TEXT, timestamp TEXT, user TEXT);
+            CREATE INDEX IF NOT EXISTS ix_feedback_model ON feedback(model_id);
+            CREATE TABLE IF NOT EXISTS docs(
+                id INTEGER PRIMARY KEY, title TEXT, category TEXT, author TEXT, date TEXT, views INTEGER DEFAULT 0,
+                file_attached INTEGER DEFAULT 0, content TEXT);
+            CREATE INDEX IF NOT EXISTS ix_docs_category ON docs(category, id);
+            CREATE TABLE IF NOT EXISTS model_versions(
+                mid INTEGER, ver INTEGER, version TEXT, created_at TEXT, doc TEXT,
+                filename TEXT, type TEXT, sha256 TEXT, size INTEGER, delta_sha TEXT, base_ver INTEGER,
+                PRIMARY KEY(mid, ver));
+            CREATE INDEX IF NOT EXISTS ix_versions_sha ON model_versions(sha256);
+            CREATE INDEX IF NOT EXISTS ix_versions_delta ON model_versions(delta_sha);
+            CREATE TABLE IF NOT EXISTS sketches(kind TEXT, id INTEGER, reg BLOB, PRIMARY KEY(kind, id));
+            CREATE TABLE IF NOT EXISTS meta(k TEXT PRIMARY KEY, v TEXT);
+        """)
+        # 구버전(data BLOB 컬럼) model_files → blob store 로 이전
+        if 'data' in [r['name'] for r in self.db.execute("PRAGMA table_info(model_files)")]:
+            rows = self.db.execute("SELECT mid, filename, type, data FROM model_files").fetchall()
+            with self.tx() as c:
+                c.execute("DROP TABLE model_files")
+                c.execute("CREATE TABLE model_files(mid INTEGER PRIMARY KEY, filename TEXT, type TEXT, sha256 TEXT, size INTEGER, codec TEXT DEFAULT 'raw', stored INTEGER)")
+                for r in rows:
+                    sha, n = self.blobs.put(r['data'] or b'')
+                    c.execute("INSERT INTO model_files VALUES(?,?,?,?,?,?,?)", (r['mid'], r['filename'], r['type'], sha, n, *self.blobs.stat(sha)))
+        # 압축 저장 이전 스키마 → 코덱/저장 크기 컬럼 추가 (기존 파일은 raw)
+        if 'codec' not in [r['name'] for r in self.db.execute("PRAGMA table_info(model_files)")]:
+            with self.tx() as c:
+                c.execute("ALTER TABLE model_files ADD COLUMN codec TEXT DEFAULT 'raw'")
+                c.execute("ALTER TABLE model_files ADD COLUMN stored INTEGER")
+        self.db.execute("CREATE INDEX IF NOT EXISTS ix_files_sha ON model_files(sha256)")
+        self.pk, self.fts, self.bits, self.order = ModelIndex(), TextIndex(), BitmapIndex(), OrderIndex()
+        self.recent = RecentIndex(lambda k, n: [(self.pk.by_id[i].get(k) or '', i) for i in
+                                                self.order.walk(k, True, self.bits.bm['status'].get('active', 0), 0, n)])
+        self.indexes = [self.pk, self.fts, self.bits, self.order, self.recent]
+        self.on_delete = []   # (종류, id) 콜백 — 삭제 직전에 메모리 상태(CounterService 등)를 정리
+        for r in self.db.execute("SELECT * FROM models"):
+            m = self._row_model(r)
+            for ix in self.indexes: ix.put(m)
+
+    @contextmanager
+    def tx(self):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.db
+            except BaseException:
+                self.db.execute("ROLLBACK"); raise
+            self.db.execute("COMMIT")
+
+    def _q(self, sql, args=()):
+        with self.lock:
+            return self.db.execute(sql, args).fetchall()
+
+    def get_meta(self, k, d=None):
+        r = self._q("SELECT v FROM meta WHERE k=?", (k,))
+        return r[0]['v'] if r else d
+
+    def set_meta(self, k, v):
+        with self.tx() as c: c.execute("INSERT OR REPLACE INTO meta(k,v) VALUES(?,?)", (k, str(v)))
+
+    # ---------- models ----------
+    @staticmethod
+    def _row_model(r):
+        m = json.loads(r['doc'])
+        m['id'], m['downloads'], m['views'] = r['id'], r['downloads'], r['views']
+        return m
+
+    def _write_model(self, c, m):
+        doc = json.dumps({k: v for k, v in m.items() if k not in ('id', 'downloads', 'views')}, ensure_ascii=False)
+        c.execute(f"""INSERT INTO models(id,{','.join(_MODEL_COLS)},downloads,views,doc) VALUES(?,{','.join('?'*len(_MODEL_COLS))},?,?,?)
+                      ON CONFLICT(id) DO UPDATE SET {','.join(f'{k}=excluded.{k}' for k in _MODEL_COLS)},doc=excluded.doc""",
+                  (m['id'], *[m.get(k, 'active' if k == 'status' else '') for k in _MODEL_COLS], m.get('downloads', 0), m.get('views', 0), doc))
+
+    def _reindex(self, m, old):
+        for ix in self.indexes:
+            if m is None: ix.remove(old)
+            else: ix.put(m, old)
+
+    def add_model(self, m):
+        with self.tx() as c:
+            if not m.get('id'):
+                m['id'] = (c.execute("SELECT COALESCE(MAX(id),0) FROM models").fetchone()[0]) + 1
+            self._write_model(c, m)
+            self._reindex(dict(m), self.pk.by_id.get(m['id']))
+        return m['id']
+
+    def add_models(self, batch):
+        """[(모델, (filename, mime, sha256, size) | None)] 를 한 트랜잭션으로 등록합니다. blob 은 미리 기록돼 있어야 하며,
+        커밋이 실패하면 이 배치만 참조하던 blob 을 정리합니다."""
+        try:
+            with self.tx() as c:
+                nid = c.execute("SELECT COALESCE(MAX(id),0) FROM models").fetchone()[0]
+                for m, f in batch:
+                    nid += 1; m['id'] = nid
+                    self._write_model(c, m)
+                    if f: c.execute("INSERT INTO model_files(mid,filename,type,sha256,size,codec,stored) VALUES(?,?,?,?,?,?,?)", (nid, *f, *self.blobs.stat(f[2])))
+                    self._insert_version(c, m, 1, f and {'filename': f[0], 'type': f[1], 'sha256': f[2], 'size': f[3]})
+                for m, _ in batch: self._reindex(dict(m), None)
+        except BaseException:
+            with self.tx() as c:
+                for _, f in batch:
+                    if f: self._gc_blob(c, f[2])
+            raise
+        return [m['id'] for m, _ in batch]
+
+    def update_model(self, m):
+        with self.tx() as c:
+            self._write_model(c, m)
+            old = self.pk.by_id.get(m['id'])
+            # 카운터는 DB 값이 기준 — 화면에서 들고 온 레코드의 값으로 덮지 않음
+            self._reindex({**m, 'downloads': old.get('downloads', 0), 'views': old.get('views', 0)} if old else dict(m), old)
+
+    def delete_model(self, mid):
+        # 콜백은 트랜잭션 밖에서 — CounterService.flush 와 같은 락 순서(카운터 → 저장소)를 지킴
+        for f in self.on_delete: f('model', mid)
+        with self.tx() as c:
+            shas = {x[0] for x in c.execute("""SELECT sha256 FROM model_files WHERE mid=:m UNION
+                                                SELECT sha256 FROM model_versions WHERE mid=:m UNION
+                                                SELECT delta_sha FROM model_versions WHERE mid=:m""", {'m': mid}) if x[0]}
+            for t in ('models', 'model_files', 'model_versions'):
+                c.execute(f"DELETE FROM {t} WHERE {'id' if t == 'models' else 'mid'}=?", (mid,))
+            c.execute("DELETE FROM sketches WHERE kind='model' AND id=?", (mid,))
+            for sha in shas: self._gc_blob(c, sha)
+            if mid in self.pk.by_id: self._reindex(None, self.pk.by_id[mid])
+
+    def add_counts(self, counts):
+        """{('model'|'doc', id, 필드): 증분} 을 한 트랜잭션으로 반영합니다 (CounterService 의 일괄 기록)."""
+        with self.tx() as c:
+            for (kind, i, field), n in counts.items():
+                if (kind, field) == ('doc', 'views'):
+                    c.execute("UPDATE docs SET views=views+? WHERE id=?", (n, i)); continue
+                if kind != 'model' or field not in ('views', 'downloads'): raise ValueError((kind, field))
+                c.execute(f"UPDATE models SET {field}={field}+? WHERE id=?", (n, i))
+                old = self.pk.by_id.get(i)
+                if old:
+                    # 카운터는 레코드·revision 과 정렬 키에만 영향 — 검색어/비트맵/최근 목록 인덱스는 건드리지 않음
+                    m = {**old, field: old.get(field, 0) + n}
+                    self.pk.put(m, old); self.order.put(m, old)
+
+    def counts(self, kind, i):
+        """저장된 카운터 값 (CounterService.merged 가 store.lock 아래에서 읽음)"""
+        if kind == 'model':
+            m = self.pk.by_id.get(i) or {}
+            return {f: m[f] for f in ('views', 'downloads') if f in m}
+        r = self._q("SELECT views FROM docs WHERE id=?", (i,))
+        return {'views': r[0][0]} if r else {}
+
+    def get_model(self, mid):
+        try: m = self.pk.by_id.get(int(mid))
+        except (TypeError, ValueError): return None
+        return dict(m) if m else None
+
+    def get_model_by_ref(self, ref):
+        """외부 model_id 문자열(예: waf_sql_001)로 조회합니다."""
+        mid = self.pk.by_mid.get(ref)
+        return self.get_model(mid) if mid is not None else None
+
+    def resolve_model(self, key):
+        """딥링크용: 숫자면 id, 아니면 외부 model_id 로 조회합니다."""
+        return (self.get_model(key) if str(key).isdigit() else None) or self.get_model_by_ref(key)
+
+    def _filter_bits(self, search="", **flt):
+        b = self.bits.query(**flt)
+        if search: b &= _bitmap(self.fts.search(search))
+        return b
+
+    def list_models(self, order='id', desc=False, limit=None, offset=0, search="", after=None, before=None, **flt):
+        """필터는 비트맵 AND/OR, 검색어는 역색인 후보와의 AND 로 계산한 뒤 정렬·슬라이스합니다.
+        after/before 는 정렬 키 커서((값, id), cursor_of() 참고)로 OrderIndex 정렬에서만 쓰입니다."""
+        if order not in _MODEL_ORDERS: raise ValueError(order)
+        if order == 'relevance' and not search: order, desc = 'updated_at', True
+        if order not in OrderIndex.KEYS: after = before = None
+        end = None if limit is None else offset + limit
+        with self.lock:
+            b = self._filter_bits(search, **flt)
+            if order in OrderIndex.KEYS and b.bit_count() * 8 >= len(self.pk.by_id):
+                # 결과가 넓으면 미리 정렬된 순서를 걸으며 필요한 만큼만 꺼냄
+                ids = self.order.walk(order, desc, b, offset, limit, after, before)
+            else:
+                ids = _bit_ids(b)
+                if order == 'relevance':
+                    sc = self.fts.score(ids, search)
+                    ids.sort(key=lambda i: (-sc[i], i))
+                elif order in OrderIndex.KEYS:
+                    kf = lambda i: self.order.key(self.pk.by_id[i], order)
+                    ids.sort(key=kf, reverse=desc)
+                    if after is not None:
+                        c = tuple(after); ids = [i for i in ids if (kf(i) < c if desc else kf(i) > c)]
+                    if before is not None:
+                        c = tuple(before); ids = [i for i in ids if (kf(i) > c if desc else kf(i) < c)]
+                        if limit: ids = ids[-limit:]
+                elif desc: ids.reverse()
+                ids = ids[offset:end]
+            return [dict(self.pk.by_id[i]) for i in ids]
+
+    def cursor_of(self, m, order):
+        """keyset 페이지네이션 커서 문자열 '<정렬키>:<값>~<id>'."""
+        v, i = self.order.key(m, order)
+        return f"{order}:{v}~{i}"
+
+    @staticmethod
+    def parse_cursor(c, order):
+        """다른 정렬에서 만든 커서는 None (값을 엉뚱한 키로 해석하지 않음)"""
+        try:
+            k, _, c = c.partition(':')
+            if k != order: return None
+            v, i = c.rsplit('~', 1)
+            return (int(v) if isinstance(OrderIndex.KEYS[order], int) else v, int(i))
+        except (AttributeError, KeyError, ValueError): return None
+
+    def recent_models(self, kind, n=4):
+        """홈 화면용 최근 등록(created_at)/업데이트(updated_at) active 모델 n 개 — O(k)."""
+        with self.lock: return [dict(self.pk.by_id[i]) for i in self.recent.get(kind, n)]
+
+    def facets(self, search="", **flt):
+        """현재 검색어 + 필터 상태의 패싯 건수 (비트맵 AND + popcount, 카탈로그 재스캔 없음)."""
+        with self.lock:
+            return self.bits.facets(_bitmap(self.fts.search(search)) if search else self.bits.all, **flt)
+
+    def count_models(self, search="", **flt):
+        with self.lock: return self._filter_bits(search, **flt).bit_count()
+
+    def model_stats(self):
+        r = self._q("SELECT COUNT(*) n, SUM(status='active') a, COALESCE(SUM(downloads),0) d, COALESCE(SUM(views),0) v FROM models")[0]
+        return {'total': r['n'], 'active': r['a'] or 0, 'downloads': r['d'], 'views': r['v'],
+                'by_log_type': {x[0]: x[1] for x in self._q("SELECT log_type, COUNT(*) FROM models GROUP BY log_type")},
+                'by_type': {x[0]: x[1] for x in self._q("SELECT type, COUNT(*) FROM models GROUP BY type")}}
+
+    # ---------- model_files ----------
+    def _gc_blob(self, c, sha):
+        """현재 파일, 전체 저장된 버전, 델타 어디에서도 참조하지 않으면 blob 삭제"""
+        if not c.execute("""SELECT 1 FROM model_files WHERE sha256=:s UNION ALL
+                            SELECT 1 FROM model_versions WHERE (sha256=:s AND delta_sha IS NULL) OR delta_sha=:s LIMIT 1""", {'s': sha}).fetchone():
+            self.blobs.remove(sha)
+
+    def put_model_file(self, mid, filename, src, mime):
+        """src(bytes 또는 업로드 파일)를 blob store 에 기록하고 카탈로그에는 해시 참조만 남깁니다."""
+        sha, n = self.blobs.put(src)
+        with self.tx() as c:
+            old = c.execute("SELECT sha256 FROM model_files WHERE mid=?", (mid,)).fetchone()
+            c.execute("INSERT OR REPLACE INTO model_files(mid,filename,type,sha256,size,codec,stored) VALUES(?,?,?,?,?,?,?)", (mid, filename, mime, sha, n, *self.blobs.stat(sha)))
+            if old and old[0] != sha: self._gc_blob(c, old[0])
+        return sha
+
+    def get_model_file(self, mid):
+        r = self._q("SELECT filename, type, sha256, size FROM model_files WHERE mid=?", (mid,))
+        return dict(r[0]) if r else None
+
+    # ---------- versions ----------
+    def _insert_version(self, c, m, ver, f):
+        snap = json.dumps({k: v for k, v in m.items() if k not in ('id', 'downloads', 'views')}, ensure_ascii=False)
+        c.execute("INSERT INTO model_versions(mid,ver,version,created_at,doc,filename,type,sha256,size) VALUES(?,?,?,?,?,?,?,?,?)",
+                  (m['id'], ver, m.get('version', ''), datetime.now().strftime("%Y-%m-%d %H:%M"), snap,
+                   *((f['filename'], f['type'], f['sha256'], f['size']) if f else (None,) * 4)))
+
+    def list_versions(self, mid):
+        """최신 버전부터 (doc 제외)"""
+        return [dict(r) for r in self._q("SELECT mid, ver, version, created_at, filename, type, sha256, size, delta_sha, base_ver FROM model_versions WHERE mid=? ORDER BY ver DESC", (mid,))]
+
+    def get_version(self, mid, ver):
+        r = self._q("SELECT * FROM model_versions WHERE mid=? AND ver=?", (mid, ver))
+        return {**dict(r[0]), 'doc': json.loads(r[0]['doc'])} if r else None
+
+    def snapshot_version(self, mid):
+        """현재 레코드 + 파일을 새 버전으로 기록 (버전 문자열·파일이 최신 버전과 같으면 생략).
+        파일이 바뀌었으면 이전 파일을 새 파일 기준 델타로 바꿔 저장합니다 (델타가 더 작을 때만)."""
+        m, f = self.get_model(mid), self.get_model_file(mid)
+        if not m: return None
+        with self.tx() as c:
+            last = c.execute("SELECT ver, version, sha256 FROM model_versions WHERE mid=? ORDER BY ver DESC LIMIT 1", (mid,)).fetchone()
+            if last and last['version'] == m.get('version', '') and last['sha256'] == (f and f['sha256']): return None
+            ver = (last['ver'] if last else 0) + 1
+            self._insert_version(c, m, ver, f)
+        if last and last['sha256'] and f and last['sha256'] != f['sha256']:
+            self._deltify(mid, last['sha256'], ver, f['sha256'])
+        return ver
+
+    def _deltify(self, mid, sha, base_ver, base_sha):
+        """이 모델에서 sha 를 전체로 저장한 버전들을 base_ver(내용 base_sha) 기준 델타로 바꿉니다."""
+        if not self.blobs.exists(sha) or not self.blobs.exists(base_sha): return
+        with tempfile.SpooledTemporaryFile(max_size=8 << 20) as out:
+            with self._seekable(self.blobs.open(base_sha)) as base, self.blobs.open(sha) as tgt:
+                make_delta(base, tgt, out)
+            dsha, _ = self.blobs.put(out)
+        with self.tx() as c:
+            if self.blobs.stat(dsha)[1] < self.blobs.stat(sha)[1]:
+                c.execute("UPDATE model_versions SET delta_sha=?, base_ver=? WHERE mid=? AND sha256=? AND delta_sha IS NULL", (dsha, base_ver, mid, sha))
+                self._gc_blob(c, sha)
+            else:
+                self._gc_blob(c, dsha)
+
+    @staticmethod
+    def _seekable(f):
+        """압축 스트림은 뒤로 seek 가 느리므로 임시 파일로 풀어 둠"""
+        if isinstance(f, (io.BufferedReader, io.BufferedRandom)): return f
+        t = tempfile.TemporaryFile()
+        with f: shutil.copyfileobj(f, t, BlobStore.CHUNK)
+        t.seek(0)
+        return t
+
+    def open_version(self, mid, ver):
+        """버전 파일을 읽기용으로 엽니다. 델타로 저장된 버전은 기준 버전부터 거슬러 올라가며 복원합니다."""
+        r = self._q("SELECT sha256, delta_sha, base_ver FROM model_versions WHERE mid=? AND ver=?", (mid, ver))
+        if not r or not r[0]['sha256']: return None
+        r = r[0]
+        if not r['delta_sha']: return self.blobs.open(r['sha256'])
+        out = tempfile.TemporaryFile()
+        with self._seekable(self.open_version(mid, r['base_ver'])) as base, self.blobs.open(r['delta_sha']) as d:
+            apply_delta(base, d, out)
+        out.seek(0)
+        return out
+
+    def read_version(self, mid, ver):
+        f = self.open_version(mid, ver)
+        if f is None: return b''
+        with f: return f.read()
+
+    def blob_info(self, sha):
+        """해시 → {'size': 원본 크기, 'codec', 'stored': 저장 크기} (카탈로그에서 참조하지 않으면 None)"""
+        r = self._q("SELECT size, codec, COALESCE(stored, size) stored FROM model_files WHERE sha256=? LIMIT 1", (sha,))
+        return dict(r[0]) if r else None
+
+    def storage_stats(self):
+        """서로 다른 아티팩트 기준 원본/저장 바이트와 코덱별 개수"""
+        sub = "(SELECT DISTINCT sha256, size, codec, COALESCE(stored, size) stored FROM model_files)"
+        r = self._q(f"SELECT COUNT(*) n, COALESCE(SUM(size),0) raw, COALESCE(SUM(stored),0) stored FROM {sub}")[0]
+        return {'files': r['n'], 'raw': r['raw'], 'stored': r['stored'],
+                'by_codec': {x[0] or 'raw': x[1] for x in self._q(f"SELECT codec, COUNT(*) FROM {sub} GROUP BY codec")}}
+
+    # ---------- feedback ----------
+    def add_feedback(self, fb):
+        with self.tx() as c:
+            c.execute("INSERT INTO feedback(model_id,model_name,rating,feedback,timestamp,user) VALUES(?,?,?,?,?,?)",
+                      (fb['model_id'], fb['model_name'], fb['rating'], fb['feedback'], fb['timestamp'], fb['user']))
+
+    def list_feedback(self, model_id=None, newest_first=True):
+        w, a = (" WHERE model_id=?", (model_id,)) if model_id is not None else ("", ())
+        return [dict(r) for r in self._q(f"SELECT * FROM feedback{w} ORDER BY id {'DESC' if newest_first else 'ASC'}", a)]
+
+    def feedback_summary(self):
+        r = self._q("SELECT COUNT(*) n, AVG(rating) avg FROM feedback")[0]
+        return r['n'], r['avg'] or 0.0
+
+    # ---------- docs ----------
+    @staticmethod
+    def _row_doc(r):
+        d = dict(r); d['file_attached'] = bool(d['file_attached'])
+        return d
+
+    def add_doc(self, d):
+        with self.tx() as c:
+            if not d.get('id'):
+                d['id'] = (c.execute("SELECT COALESCE(MAX(id),0) FROM docs").fetchone()[0]) + 1
+            c.execute("INSERT OR REPLACE INTO docs(id,title,category,author,date,views,file_attached,content) VALUES(?,?,?,?,?,?,?,?)",
+                      (d['id'], d['title'], d['category'], d['author'], d['date'], d.get('views', 0), int(bool(d.get('file_attached'))), d['content']))
+        return d['id']
+
+    def get_doc(self, did):
+        r = self._q("SELECT * FROM docs WHERE id=?", (did,))
+        return self._row_doc(r[0]) if r else None
+
+    def list_docs(self, category=None, limit=None, offset=0):
+        w, a = (" WHERE category=?", [category]) if category else ("", [])
+        sql = f"SELECT * FROM docs{w} ORDER BY id"
+        if limit is not None: sql += " LIMIT ? OFFSET ?"; a += [limit, offset]
+        return [self._row_doc(r) for r in self._q(sql, a)]
+
+    def count_docs(self, category=None):
+        w, a = (" WHERE category=?", (category,)) if category else ("", ())
+        return self._q(f"SELECT COUNT(*) FROM docs{w}", a)[0][0]
+
+    def doc_categories(self):
+        return [r[0] for r in self._q("SELECT DISTINCT category FROM docs ORDER BY category")]
+
+    # ---------- sketches (고유 조회자 HLL) ----------
+    def get_sketch(self, kind, i):
+        r = self._q("SELECT reg FROM sketches WHERE kind=? AND id=?", (kind, i))
+        return r[0][0] if r else None
+
+    def put_sketches(self, regs):
+        with self.tx() as c:
+            c.executemany("INSERT OR REPLACE INTO sketches(kind,id,reg) VALUES(?,?,?)", [(k, i, r) for (k, i), r in regs.items()])
+
+    # ---------- export ----------
+    def _scan(self, sql, key='id', batch=500):
+        """keyset 으로 배치씩 읽기 — 배치 사이에는 락을 놓고, 메모리에는 한 배치만"""
+        last = 0
+        while True:
+            rs = self._q(f"{sql} WHERE {key}>? ORDER BY {key} LIMIT ?", (last, batch))
+            yield from rs
+            if len(rs) < batch: return
+            last = rs[-1][key.split('.')[-1]]
+
+    def iter_export(self):
+        """카탈로그 전체 → (종류, 레코드). 모델 레코드에는 파일 메타데이터(file)가 붙습니다."""
+        for r in self._scan("SELECT m.id, m.downloads, m.views, m.doc, f.filename, f.type, f.sha256, f.size FROM models m LEFT JOIN model_files f ON f.mid=m.id", 'm.id'):
+            m = self._row_model(r)
+            if r['sha256']: m['file'] = {'filename': r['filename'], 'type': r['type'], 'sha256': r['sha256'], 'size': r['size']}
+            yield 'model', m
+        for r in self._scan("SELECT * FROM feedback"): yield 'feedback', dict(r)
+        for r in self._scan("SELECT * FROM docs"): yield 'doc', self._row_doc(r)
+
+    def export_ndjson(self):
+        for k, d in self.iter_export():
+            yield json.dumps({'kind': k, 'data': d}, ensure_ascii=False).encode('utf-8') + b'\n'
+
+    def write_export_zip(self, fp):
+        """catalog.ndjson + artifacts/<sha256> 를 fp 에 zip 으로 씁니다 (fp 는 seek 불가 스트림이어도 됨)."""
+        with zipfile.ZipFile(fp, 'w', zipfile.ZIP_DEFLATED) as z:
+            with z.open('catalog.ndjson', 'w', force_zip64=True) as out:
+                for line in self.export_ndjson(): out.write(line)
+            seen = set()
+            for r in self._scan("SELECT mid, sha256 FROM model_files", 'mid'):
+                sha = r['sha256']
+                if sha in seen or not self.blobs.exists(sha): continue
+                seen.add(sha)
+                zi = zipfile.ZipInfo(f"artifacts/{sha}", datetime.now().timetuple()[:6])
+                zi.compress_type = zipfile.ZIP_STORED   # 모델 바이너리는 대개 이미 압축돼 있음
+                with self.blobs.open(sha) as src, z.open(zi, 'w', force_zip64=True) as out:
+                    shutil.copyfileobj(src, out, BlobStore.CHUNK)
+
+class HyperLogLog:
+    """고유 조회자 추정용 HyperLogLog — 2^P 개 레지스터를 바이트 배열로 (P=12 면 항목당 4 KB, 표준오차 약 1.6%).
+    조회가 수백만 번이어도 크기는 그대로이고, 같은 조회자를 여러 번 넣어도 값이 바뀌지 않습니다."""
+    P = 12
+    M = 1 << P
+
+    def __init__(self, reg=None):
+        self.reg = bytearray(reg) if reg else bytearray(self.M)
+
+    def add(self, item):
+        """레지스터가 바뀌었으면 True (저장이 필요한 경우만)"""
+        h = int.from_bytes(hashlib.blake2b(str(item).encode('utf-8'), digest_size=8).digest(), 'big')
+        i, w = h >> (64 - self.P), h & ((1 << (64 - self.P)) - 1)
+        r = (64 - self.P) - w.bit_length() + 1   # 남은 비트의 선행 0 개수 + 1
+        if r <= self.reg[i]: return False
+        self.reg[i] = r
+        return True
+
+    def count(self):
+        m, reg = self.M, np.frombuffer(bytes(self.reg), np.uint8)
+        e = 0.7213 / (1 + 1.079 / m) * m * m / float(np.ldexp(1.0, -reg.astype(np.int32)).sum())
+        z = int((reg == 0).sum())
+        if e <= 2.5 * m and z: e = m * math.log(m / z)   # 작은 범위는 linear counting (64비트 해시라 큰 범위 보정 불필요)
+        return int(round(e))
+
+class CounterService:
+    """조회/다운로드 카운터의 write-behind 버퍼.
+    각 스레드는 자기 전용 dict 에만 누적하므로(쓰는 쪽이 하나뿐) 증가에 락이 없고,
+    flush 스레드가 주기적으로 스레드별 누적값과 이미 기록한 값의 차이만 모아 한 트랜잭션으로 씁니다."""
+
+    def __init__(self, store, interval=COUNTER_FLUSH, window=VIEW_WINDOW):
+        self.store = store
+        self.window = window
+        self.seen = OrderedDict()          # (종류, id, 조회자) → 마지막으로 센 시각, 오래된 것부터 (TTL 정리)
+        self.local = threading.local()
+        self.slots = []                    # [(스레드, 누적 dict, 기록된 dict)] — 등록할 때만 락
+        self.lock = threading.Lock()       # slots 등록/정리, flush 직렬화
+        self.stop = threading.Event()
+        self.sketches = {}                 # (종류, id) → HyperLogLog, 한 번 읽은 것만 메모리에
+        self.dirty = set()
+        self.slock = threading.Lock()
+        store.on_delete.append(self.forget)
+        threading.Thread(target=self._run, args=(interval,), daemon=True, name="hub-counters").start()
+
+    def incr(self, kind, i, field, n=1):
+        d = getattr(self.local, 'd', None)
+        if d is None:
+            d = self.local.d = {}
+            with self.lock: self.slots.append((threading.current_thread(), d, {}))
+        k = (kind, i, field)
+        d[k] = d.get(k, 0) + n
+
+    def pending(self, kind, i, field):
+        k = (kind, i, field)
+        return sum(d.get(k, 0) - done.get(k, 0) for _, d, done in list(self.slots))
+
+    def merged(self, rec, kind, fields=('views', 'downloads')):
+        """저장된 값 + 아직 기록되지 않은 증분 (읽는 쪽이 보는 값).
+        flush 가 기록과 '기록됨' 표시를 store.lock 아래에서 함께 하므로, 같은 락 아래에서 저장값을 다시 읽어 합칩니다."""
+        with self.store.lock:
+            base = self.store.counts(kind, rec['id'])
+            for f in fields:
+                if f in rec: rec[f] = base.get(f, rec[f]) + self.pending(kind, rec['id'], f)
+        return rec
+
+    def view(self, kind, i, viewer):
+        """조회 1회 — 같은 조회자가 window 안에 다시 보면 세지 않습니다. 셌으면 True."""
+        k, now = (kind, i, viewer), datetime.now().timestamp()
+        with self.slock:
+            if now - self.seen.get(k, 0) < self.window: return False
+            self.seen[k] = now; self.seen.move_to_end(k)
+            while self.seen and now - next(iter(self.seen.values())) >= self.window: self.seen.popitem(last=False)
+            if self._sketch((kind, i)).add(viewer): self.dirty.add((kind, i))
+        self.incr(kind, i, 'views')
+        return True
+
+    def _sketch(self, k):
+        h = self.sketches.get(k)
+        if h is None: h = self.sketches[k] = HyperLogLog(self.store.get_sketch(*k))
+        return h
+
+    def unique(self, kind, i):
+        with self.slock: return self._sketch((kind, i)).count()
+
+    def forget(self, kind, i):
+        """삭제된 항목의 스케치·조회 기록·미기록 증분을 버림 — id 가 재사용돼도 새 항목에 섞이지 않음"""
+        with self.lock, self.slock:
+            self.sketches.pop((kind, i), None); self.dirty.discard((kind, i))
+            for k in [k for k in self.seen if k[:2] == (kind, i)]: del self.seen[k]
+            for _, d, done in self.slots:
+                for f in ('views', 'downloads'):
+                    if (kind, i, f) in d: done[(kind, i, f)] = d[(kind, i, f)]   # 기록된 것으로 처리
+
+    def flush(self):
+        with self.lock:
+            with self.slock:
+                regs = {k: bytes(self.sketches[k].reg) for k in self.dirty}
+                self.dirty.clear()
+            if regs:
+                try: self.store.put_sketches(regs)
+                except Exception:
+                    with self.slock: self.dirty.update(regs)
+                    raise
+            batch, snaps = {}, []
+            for t, d, done in self.slots:
+                cur = d.copy()             # dict.copy 는 GIL 아래 원자적 — 소유 스레드와 경합 없음
+                for k, v in cur.items():
+                    if v != done.get(k, 0): batch[k] = batch.get(k, 0) + v - done.get(k, 0)
+                snaps.append((done, cur))
+            with self.store.lock:          # 읽는 쪽이 DB 값과 미기록분을 이중으로 세지 않도록 함께 넘김
+                if batch: self.store.add_counts(batch)
+                for done, cur in snaps: done.update(cur)
+            # 끝난 스레드는 전부 기록된 뒤에 정리 (Streamlit 은 rerun 마다 스레드가 바뀔 수 있음)
+            self.slots = [x for x in self.slots if x[0].is_alive() or x[1] != x[2]]
+        return batch
+
+    def _run(self, interval):
+        while not self.stop.wait(interval):
+            try: self.flush()
+            except Exception: pass         # DB 가 잠시 잠겨도 다음 주기에 같은 차이를 다시 씀
 
-# ===== 영구 저장소 (서버 실행 중 유지) =====
 @st.cache_resource
 def get_store():
-    return {"models": [], "model_files": {}, "feedback": [], "docs": [], "init": False}
+    return CatalogStore(DB_PATH, BlobStore(BLOB_DIR))
 
 store = get_store()
 
-if not store["init"]:
-    store["models"] = [
+@st.cache_resource
+def get_counters():
+    c = CounterService(store)
+    atexit.register(c.flush)
+    return c
+
+counters = get_counters()
+
+if store.get_meta("init") != "1":
+    for m in [
         {
             'id': 1, 'name': 'WAF SQL Injection Detector', 'algorithm': 'Random Forest', 'type': '지도학습',
             'log_type': 'WAF', 'version': 'v1.2.1', 'size': '15.2 MB', 'model_id': 'waf_sql_001',
@@ -64,8 +1076,9 @@ if not store["init"]:
             'dataset_settings': {'logType': ['ids'], 'features': ['login_count']},
             'trigger_settings': {'fadingFactor': 0.95, 'boundType': 'UPPER', 'sensitivity': 0.7}
         }
-    ]
-    store["docs"] = [
+    ]:
+        store.add_model(m)
+    for d in [
         {'id': 1, 'title': 'IGLOO AI Model Hub 시작하기', 'category': '사용자 가이드', 'author': '관리자', 'date': '2024-02-11', 'views': 45,
          'content': 'IGLOO AI Model Hub는 보안 위협 탐지를 위한 AI 모델들을 중앙에서 관리하고 배포하는 플랫폼입니다.', 'file_attached': False},
         {'id': 2, 'title': 'JSON 설정 파일 구조 가이드', 'category': '기술 문서', 'author': '개발팀', 'date': '2024-02-10', 'views': 32,
@@ -74,8 +1087,159 @@ if not store["init"]:
          'content': '환경마다 로그 필드명이 다를 수 있습니다. 예: sent_bytes vs bytes_sent vs send_byte', 'file_attached': False},
         {'id': 4, 'title': 'ExD 모델 업로드 방법 안내', 'category': '운영 가이드', 'author': '관리자', 'date': '2024-02-08', 'views': 19,
          'content': 'Management 메뉴에서 모델을 등록하고, JSON 설정 파일과 모델 바이너리 파일을 업로드합니다.', 'file_attached': True}
-    ]
-    store["init"] = True
+    ]:
+        store.add_doc(d)
+    store.set_meta("init", 1)
+
+# ===== 보조 파일 서버 (카탈로그 내보내기) =====
+class FileHandler(BaseHTTPRequestHandler):
+    """토큰(?t= 또는 Bearer) 확인 후 카탈로그/모델 파일을 스트리밍합니다. 본문은 청크 단위로만 메모리에 올라갑니다."""
+    store, token = None, ''
+
+    def log_message(self, *a): pass
+
+    def _authorized(self, q):
+        t = q.get('t', [''])[0] or self.headers.get('Authorization', '').removeprefix('Bearer ')
+        return hmac.compare_digest(t.encode(), self.token.encode())
+
+    def _start(self, mime, filename, size=None, code=200):
+        self.send_response(code)
+        self.send_header('Content-Type', mime)
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(filename)}")
+        if size is not None: self.send_header('Content-Length', str(size))
+
+    @staticmethod
+    def _range(h, size):
+        """Range 헤더 → (시작, 끝) / None(전체) / False(만족 불가). 단일 구간만 지원, 여러 구간이면 전체를 보냄."""
+        m = re.fullmatch(r'bytes=(\d*)-(\d*)', h.strip())
+        if not m or not any(m.groups()): return None
+        a, b = m.groups()
+        if not a: a, b = max(size - int(b), 0), size - 1   # bytes=-N : 마지막 N 바이트
+        else: a, b = int(a), min(int(b), size - 1) if b else size - 1
+        return (a, b) if a <= b and a < size else False
+
+    def _accepts(self, codec):
+        for t in self.headers.get('Accept-Encoding', '').split(','):
+            k, _, prm = t.partition(';')
+            if k.strip() == codec and not re.fullmatch(r'\s*q=0(\.0*)?\s*', prm): return True
+        return False
+
+    def _blob(self, sha, name, mid=None, body=True, fixed=True):
+        """해시로 찾은 blob 전송 — ETag(=해시)/If-None-Match, Range/If-Range 이어받기, sendfile 로 복사 없이 보냄.
+        압축 저장분은 클라이언트가 그 코덱을 받으면(Range 없을 때) 디스크 내용을 그대로 Content-Encoding 으로,
+        아니면 풀면서 원본을 보냅니다. 처음부터 받는 GET 만 다운로드 수에 셉니다.
+        fixed=False 는 내용이 바뀌는 주소(/model/...) — 캐시는 두되 매번 ETag 로 재검증하게 합니다."""
+        cc = 'private, max-age=31536000, immutable' if fixed else 'private, no-cache'
+        p, codec = self.store.blobs.locate(sha) if re.fullmatch(r'[0-9a-f]{64}', sha) else (None, None)
+        info = self.store.blob_info(sha) if p else None
+        if not info: return self.send_error(404)
+        enc = codec if codec != 'raw' and not self.headers.get('Range') and self._accepts(codec) else None
+        etag = f'"{sha}.{codec}"' if enc else f'"{sha}"'   # 표현(인코딩)마다 다른 ETag
+        inm = self.headers.get('If-None-Match')
+        if inm and (inm.strip() == '*' or etag in [t.strip().removeprefix('W/') for t in inm.split(',')]):
+            self.send_response(304); self.send_header('ETag', etag); self.send_header('Cache-Control', cc); self.end_headers(); return
+        direct = enc or codec == 'raw'
+        with (open(p, 'rb') if direct else self.store.blobs.open(sha)) as f:
+            self._send(f, os.fstat(f.fileno()).st_size if direct else info['size'], name, etag, cc, mid, body, enc, codec != 'raw')
+
+    def _send(self, f, size, name, etag, cc, mid=None, body=True, enc=None, vary=False):
+        """열린 파일 f 를 (Range 로 고른 구간만) 전송. 일반 파일이면 sendfile, 스트림이면 청크 복사."""
+        rg = self._range(self.headers.get('Range', ''), size) if not enc and self.headers.get('If-Range', etag) == etag else None
+        if rg is False:
+            self.send_response(416); self.send_header('Content-Range', f'bytes */{size}'); self.send_header('Content-Length', '0'); self.end_headers(); return
+        a, b = rg or (0, size - 1)
+        self._start('application/octet-stream', name, b - a + 1, 206 if rg else 200)
+        if rg: self.send_header('Content-Range', f'bytes {a}-{b}/{size}')
+        if enc: self.send_header('Content-Encoding', enc)
+        if vary: self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cc)
+        self.end_headers()
+        if not body: return
+        if mid is not None and a == 0: self.counters.incr('model', mid, 'downloads')
+        if b < a: return
+        if isinstance(f, (io.BufferedReader, io.BufferedRandom)):
+            self.connection.sendfile(f, a, b - a + 1)   # 가능하면 os.sendfile, 안 되면 send 로 대체
+            return
+        f.seek(a)   # 압축 스트림은 앞으로 풀면서 건너뜀
+        n = b - a + 1
+        while n > 0:
+            buf = f.read(min(BlobStore.CHUNK, n))
+            if not buf: break
+            self.wfile.write(buf); n -= len(buf)
+
+    def _version(self, mid, ver, body=True):
+        """이전 버전 파일 — 델타로 저장된 버전은 임시 파일로 복원해서 보냄 (Streamlit 메모리를 거치지 않음).
+        버전 번호의 내용은 바뀌지 않으므로 ETag 는 그 버전의 해시, 캐시는 immutable."""
+        v = self.store.get_version(mid, ver)
+        if not v or not v['sha256']: return self.send_error(404)
+        etag, cc = f'"{v["sha256"]}"', 'private, max-age=31536000, immutable'
+        inm = self.headers.get('If-None-Match')
+        if inm and (inm.strip() == '*' or etag in [t.strip().removeprefix('W/') for t in inm.split(',')]):
+            self.send_response(304); self.send_header('ETag', etag); self.send_header('Cache-Control', cc); self.end_headers(); return
+        f = self.store.open_version(mid, ver)
+        if f is None: return self.send_error(404)
+        with f: self._send(f, v['size'], v['filename'], etag, cc, body=body)
+
+    def _route(self, body=True):
+        u = urlsplit(self.path); q = parse_qs(u.query)
+        if not self._authorized(q): return self.send_error(403)
+        try:
+            if u.path.startswith('/blob/'):
+                # /blob/<sha256>?name=&m= — m 이 카탈로그에 있는 모델이면 다운로드 수 기록
+                mid = q.get('m', [''])[0]
+                mid = int(mid) if mid.isdigit() and int(mid) in self.store.pk.by_id else None
+                self._blob(u.path[6:], q.get('name', [u.path[6:]])[0], mid, body)
+            elif u.path.startswith('/model/'):
+                # /model/<id 또는 model_id> — 센서용 고정 주소, 현재 모델 파일을 보냄
+                m = self.store.resolve_model(unquote(u.path[7:]))
+                fi = self.store.get_model_file(m['id']) if m else None
+                if not fi: return self.send_error(404)
+                self._blob(fi['sha256'], fi['filename'], m['id'], body, fixed=False)
+            elif m := re.fullmatch(r'/version/(\d+)/(\d+)', u.path):
+                # /version/<id>/<ver> — 크기가 큰 이전 버전 다운로드
+                self._version(int(m[1]), int(m[2]), body)
+            elif not body:
+                self.send_error(405)
+            elif u.path == '/export.ndjson':
+                self._start('application/x-ndjson', 'catalog.ndjson'); self.end_headers()
+                for line in self.store.export_ndjson(): self.wfile.write(line)
+            elif u.path == '/export.zip':
+                self._start('application/zip', 'catalog.zip'); self.end_headers()
+                self.store.write_export_zip(self.wfile)
+            else:
+                self.send_error(404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass   # 받는 쪽이 끊음 — 이어받기는 Range 로
+
+    def do_GET(self): self._route()
+
+    def do_HEAD(self): self._route(body=False)
+
+@st.cache_resource
+def get_file_server():
+    """프로세스당 한 번 보조 HTTP 서버를 띄웁니다. 포트를 못 잡으면 None (링크를 숨김).
+    토큰은 HUB_FILE_TOKEN, 없으면 처음 한 번 만들어 meta 에 저장한 값 — 재시작해도 센서 설정이 그대로 동작합니다."""
+    if not FILE_PORT: return None
+    tok = os.environ.get("HUB_FILE_TOKEN") or store.get_meta("file_token")
+    if not tok: tok = secrets.token_urlsafe(16); store.set_meta("file_token", tok)
+    h = type('HubFileHandler', (FileHandler,), {'store': store, 'counters': counters, 'token': tok})
+    try: srv = ThreadingHTTPServer(("0.0.0.0", FILE_PORT), h)
+    except OSError: return None
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True, name="hub-files").start()
+    return srv
+
+# 스크립트가 처음 실행될 때(= 프로세스 기동 후 첫 브라우저 접속) 바로 띄움 — 어느 페이지든 한 번 열리면 이후엔 UI 와 무관하게 동작.
+# Streamlit 은 세션이 연결돼야 스크립트를 실행하므로 재시작 직후 첫 접속 전까지는 센서 주소가 응답하지 않습니다.
+file_server = get_file_server()
+
+def _file_url(path, **q):
+    srv = file_server
+    if not srv: return None
+    base = FILE_URL or f"http://{(st.context.headers.get('Host') or 'localhost').rsplit(':', 1)[0]}:{srv.server_address[1]}"
+    return f"{base}{path}?{urlencode({**q, 't': srv.RequestHandlerClass.token})}"
 
 # ===== 개발모드 바 =====
 st.markdown("""
@@ -89,7 +1253,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ===== 세션 초기화 =====
-for k, v in {'is_logged_in': False, 'login_time': None, 'user_name': '', 'show_advanced_filters': False, 'temp_json_editor': {}, 'json_search_term': '', 'edit_mode': False, 'editing_model_id': None, 'open_register_tab': False}.items():
+for k, v in {'is_logged_in': False, 'login_time': None, 'user_name': '', 'show_advanced_filters': False, 'json_work': None, 'json_search_term': '', 'edit_mode': False, 'editing_model_id': None, 'open_register_tab': False}.items():
     if k not in st.session_state:
         st.session_state[k] = v
 
@@ -349,6 +1513,10 @@ st.markdown("""
     .mc-th{margin-bottom:10px;display:flex;flex-wrap:wrap;gap:6px}
     .mc-m{display:flex;justify-content:space-between;align-items:center;font-size:.78em;color:#64748b;padding-top:10px;border-top:1px solid #f1f5f9}
     .mc-st{display:flex;gap:14px}
+    .mc-grid{display:grid;grid-template-columns:repeat(var(--cols,3),minmax(0,1fr));gap:16px;align-items:stretch}
+    .mc-grid .mc{margin-bottom:0;height:100%;box-sizing:border-box}
+    .home-2c{display:grid;grid-template-columns:repeat(2,minmax(0,1fr));gap:32px}
+    @media (max-width:900px){.mc-grid,.home-2c{grid-template-columns:minmax(0,1fr)}}
 
     /* 배지 */
     .b-log{display:inline-block;background:#dbeafe;color:#1d4ed8;padding:4px 12px;border-radius:8px;font-size:.75em;font-weight:700;border:1px solid #93c5fd}
@@ -371,6 +1539,14 @@ st.markdown("""
     .pg-b:hover{border-color:#00A98E;color:#00A98E;background:#f0fdf4}
     .pg-b.on{background:#00A98E;border-color:#00A98E;color:#fff}
 
+    /* 문서 목록 표 */
+    .doc-t{width:100%;border-collapse:collapse;font-size:.9em;background:#fff;border:1px solid #e5e7eb;border-radius:12px;overflow:hidden}
+    .doc-t th{text-align:left;font-weight:700;color:#374151;background:#f8fafc;padding:12px 14px;border-bottom:2px solid #e5e7eb}
+    .doc-t td{padding:11px 14px;border-bottom:1px solid #f1f5f9;color:#64748b}
+    .doc-t td a{color:#1e293b;font-weight:600;text-decoration:none}
+    .doc-t td a:hover{color:#00A98E}
+    .doc-t .doc-n{width:60px}
+
     /* 버튼 */
     .stButton>button{border-radius:12px!important;font-weight:600!important;border:2px solid #e5e7eb!important;background:#fff!important;color:#374151!important}
     .stButton>button:hover{border-color:#00A98E!important;color:#00A98E!important;background:#f0fdf4!important}
@@ -455,9 +1631,65 @@ def _ut(d):
         return "오늘" if n == 0 else f"{n}일 전"
     except: return d
 
+def _fo(base, cnt, *sel):
+    # 패싯 선택지: 기본 목록 + 색인에만 있는 값, 0건은 숨김(현재 선택값과 URL 기본값은 유지 — 위젯 default 가 항상 선택지 안에 있도록)
+    return [o for o in dict.fromkeys(list(base) + sorted(cnt)) if cnt.get(o) or any(o in s_ for s_ in sel)]
+
+def _viewer():
+    """조회자 키 — 링크마다 새 세션이 열리므로 세션이 아니라 브라우저 기준.
+    Streamlit XSRF 쿠키의 토큰이 있으면 그것, 없으면 IP + User-Agent 의 해시 (원래 값은 남기지 않음)"""
+    src = f"a:{st.context.ip_address}|{st.context.headers.get('User-Agent', '')}"
+    try:
+        # '2|마스크|마스크된 토큰|시각' — 마스크는 응답마다 바뀌므로 풀어낸 토큰만 씀 (브라우저를 닫을 때까지 유지)
+        _, mk, tk, _ = st.context.cookies.get('_streamlit_xsrf', '').strip('"').split('|')
+        mk, tk = bytes.fromhex(mk), bytes.fromhex(tk)
+        src = "c:" + bytes(x ^ mk[j % 4] for j, x in enumerate(tk)).hex()
+    except (ValueError, IndexError): pass
+    return hashlib.blake2b(src.encode('utf-8'), digest_size=12).hexdigest()
+
+def _count_view(kind, i):
+    """같은 브라우저의 VIEW_WINDOW 안 재실행(버튼·피드백 등)과 재방문은 조회 1회로 — 고유 조회자는 같은 키로 HLL 추정"""
+    counters.view(kind, i, _viewer())
+
 def _sc(s): return {'active':'st-a','pending':'st-p','test':'st-t','테스트':'st-t','보류':'st-p'}.get(s,'st-a')
 
+class RenderCache:
+    """렌더된 HTML 조각 LRU 캐시 (세션 간 공유). hit/miss 는 통계 탭에 표시됩니다."""
+
+    def __init__(self, maxsize=4096):
+        self.data, self.maxsize = OrderedDict(), maxsize
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, build):
+        with self.lock:
+            v = self.data.get(key)
+            if v is not None:
+                self.data.move_to_end(key); self.hits += 1
+                return v
+        v = build()
+        with self.lock:
+            self.misses += 1
+            self.data[key] = v
+            if len(self.data) > self.maxsize: self.data.popitem(last=False)
+        return v
+
+@st.cache_resource
+def get_card_cache():
+    return RenderCache()
+
+card_cache = get_card_cache()
+
 def _card(m, created=False):
+    # 키: (id, revision, created, 오늘) — 수정/카운터 변경 시 revision 이, 날짜가 바뀌면 'n일 전' 표기가 달라짐
+    k = (m['id'], store.pk.rev.get(m['id'], 0), created, datetime.now().strftime('%Y-%m-%d'))
+    return card_cache.get(k, lambda: _card_html(m, created))
+
+def _grid(ms, cols=3, created=False):
+    # 카드 그리드를 HTML 한 덩어리로 — st.columns + 카드별 st.markdown 대신 delta 1개
+    return f'<div class="mc-grid" style="--cols:{cols}">' + "".join(_card(m, created) for m in ms) + '</div>'
+
+def _card_html(m, created=False):
     tags = "".join([f'<span class="b-threat">{t}</span>' for t in m.get('threat_tags',[])[:3]])
     dt = f"📅 {m.get('created_at','-')}" if created else f"🔄 {_ut(m.get('updated_at',''))}"
     return f"""<a href="?menu=models&page=detail&model_id={m['id']}&auth=1" class="mc" target="_parent">
@@ -467,21 +1699,367 @@ def _card(m, created=False):
     <div class="mc-m"><div class="mc-st"><span>{dt}</span><span>⬇️ {m.get('downloads',0)}</span><span>👁️ {m.get('views',0)}</span></div>
     <span class="b-st {_sc(m.get('status','active'))}">{m.get('status','active')}</span></div></a>"""
 
-def highlight_json(json_str, search_term=""):
-    import re
-    lines = json_str.split('\n')
-    highlighted_lines = []
-    for i, line in enumerate(lines, 1):
-        if search_term and search_term in line:
-            line = line.replace(search_term, f'<span class="json-highlight">{search_term}</span>')
-        line = re.sub(r'"([^"]+)"\s*:', r'<span class="json-key">"\1"</span>:', line)
-        line = re.sub(r':\s*"([^"]*)"', r': <span class="json-string">"\1"</span>', line)
-        line = re.sub(r'\b(\d+\.?\d*)\b', r'<span class="json-number">\1</span>', line)
-        line = re.sub(r'\b(true|false)\b', r'<span class="json-boolean">\1</span>', line)
-        line = re.sub(r'\bnull\b', r'<span class="json-null">null</span>', line)
-        line = re.sub(r'([{}[\]])', r'<span class="json-bracket">\1</span>', line)
-        highlighted_lines.append(f'<div class="json-line"><span class="json-line-number">{i}</span><span class="json-line-content">{line}</span></div>')
-    return '\n'.join(highlighted_lines)
+_JSON_TOK = re.compile(r'(?P<s>"(?:[^"\\\n]|\\.)*")(?P<c>\s*:)?|(?P<n>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)|(?P<k>true|false|null)|(?P<b>[{}\[\]])|(?P<nl>\n)')
+_JSON_CLS = {'n': 'json-number', 'b': 'json-bracket'}
+_LINE = '<div class="json-line"><span class="json-line-number">{}</span><span class="json-line-content">'
+
+@st.cache_resource
+def get_json_hl_cache():
+    return RenderCache(maxsize=32)
+
+JSON_HL_LINES = 400   # 하이라이트 보기에 한 번에 그리는 줄 수
+
+def highlight_json(json_str, search_term="", start=1, n=JSON_HL_LINES):
+    """JSON 문자열의 start 줄부터 n 줄 → 줄번호 + 구문 강조 HTML. 보이는 범위만 훑고, 결과는 (내용 해시, 검색어, 범위)로 캐시합니다.
+    JSON 문자열 토큰은 줄을 넘지 않으므로 줄 단위로 잘라도 강조 결과는 같습니다."""
+    key = (hashlib.blake2b(json_str.encode('utf-8'), digest_size=16).hexdigest(), search_term, start, n)
+    return get_json_hl_cache().get(key, lambda: _lex_json('\n'.join(json_str.split('\n')[start - 1:start - 1 + n]), search_term, start))
+
+def _json_hits(src, term, limit=1000):
+    """검색어가 들어 있는 줄 번호(1부터, 최대 limit 개) — 이스케이프 전 원문 기준"""
+    out, ln, pos = [], 1, 0
+    while len(out) < limit and (i := src.find(term, pos)) >= 0:
+        ln += src.count('\n', pos, i); out.append(ln)
+        j = src.find('\n', i)
+        if j < 0: break
+        pos, ln = j + 1, ln + 1   # 같은 줄의 다른 일치는 건너뜀
+    return out
+
+def _lex_json(src, search_term="", ln=1):
+    esc = lambda t: html.escape(t, quote=False)
+    if search_term:
+        # 원문에서 나눈 뒤 조각별로 이스케이프 — 'lt'/'amp' 검색이 &lt; 같은 엔티티를 깨지 않음
+        hl = f'<span class="json-highlight">{esc(search_term)}</span>'
+        esc = lambda t: hl.join(html.escape(x, quote=False) for x in t.split(search_term))
+    out, pos = [_LINE.format(ln)], 0
+    for mt in _JSON_TOK.finditer(src):
+        if mt.start() > pos: out.append(esc(src[pos:mt.start()]))
+        g, t = mt.lastgroup, mt.group()
+        if g == 'nl':
+            ln += 1
+            out.append('</span></div>' + _LINE.format(ln))
+        elif mt.group('s') is not None:
+            if mt.group('c') is not None:
+                out.append(f'<span class="json-key">{esc(mt.group("s"))}</span>{esc(mt.group("c"))}')
+            else:
+                out.append(f'<span class="json-string">{esc(t)}</span>')
+        elif g == 'k':
+            out.append(f'<span class="{"json-null" if t == "null" else "json-boolean"}">{t}</span>')
+        else:
+            out.append(f'<span class="{_JSON_CLS[g]}">{esc(t)}</span>')
+        pos = mt.end()
+    out.append(esc(src[pos:]) + '</span></div>')
+    return ''.join(out)
+
+JSON_SECTION_MIN = 200   # 최상위 항목 수가 이보다 많으면 섹션 편집을 기본으로
+
+def _jget(doc, path):
+    for p in path: doc = doc[p]
+    return doc
+
+def _jset(doc, path, v):
+    _jget(doc, path[:-1])[path[-1]] = v
+
+def _jpath(path):
+    return ''.join(f'[{p}]' if isinstance(p, int) else f'.{p}' for p in path).lstrip('.') or '$'
+
+def _json_drop(tk):
+    """편집기 위젯 상태 제거 → 다음 렌더에서 캐시된 트리로 다시 채움"""
+    for k in [k for k in st.session_state if str(k).startswith(f"je_{tk}")]: del st.session_state[k]
+
+def _ptr(path):
+    return ''.join('/' + str(p).replace('~', '~0').replace('/', '~1') for p in path)
+
+def _unptr(ptr):
+    return [p.replace('~1', '/').replace('~0', '~') for p in ptr.split('/')[1:]]
+
+def _jdiff(a, b, path=()):
+    """a → b JSON Patch (dict 는 키 단위, 길이가 같은 list 는 항목 단위, 나머지는 통째로 replace)"""
+    if type(a) is type(b) and isinstance(a, dict):
+        for k in a:
+            if k not in b: yield {'op': 'remove', 'path': _ptr(path + (k,))}
+        for k, v in b.items():
+            if k not in a: yield {'op': 'add', 'path': _ptr(path + (k,)), 'value': v}
+            else: yield from _jdiff(a[k], v, path + (k,))
+    elif type(a) is type(b) and isinstance(a, list) and len(a) == len(b):
+        for i, (x, y) in enumerate(zip(a, b)): yield from _jdiff(x, y, path + (i,))
+    elif a != b or type(a) is not type(b):
+        yield {'op': 'replace', 'path': _ptr(path), 'value': b}
+
+def _jpatch(doc, ops):
+    """JSON Patch(add/remove/replace) 적용 — doc 을 직접 고치고 (루트 replace 대비) 결과를 반환"""
+    for o in ops:
+        ks = _unptr(o['path'])
+        if not ks:
+            doc = o['value']; continue
+        par = doc
+        for k in ks[:-1]: par = par[int(k) if isinstance(par, list) else k]
+        k = ks[-1]
+        if isinstance(par, list):
+            i = len(par) if k == '-' else int(k)
+            if o['op'] == 'add': par.insert(i, o['value'])
+            elif o['op'] == 'remove': del par[i]
+            else: par[i] = o['value']
+        elif o['op'] == 'remove': del par[k]
+        else: par[k] = o['value']
+    return doc
+
+class DraftStore:
+    """JSON 편집 초안 — 원본 대비 패치만 보관하는 세션별 LRU (직렬화 바이트 기준 상한)"""
+
+    def __init__(self, max_bytes=DRAFT_MAX_BYTES):
+        self.data, self.max_bytes, self.size = OrderedDict(), max_bytes, 0
+
+    def __contains__(self, tk): return tk in self.data
+
+    def get(self, tk):
+        if tk not in self.data: return []
+        self.data.move_to_end(tk)
+        return self.data[tk][0]
+
+    def set(self, tk, ops):
+        self.drop(tk)
+        if not ops: return
+        n = len(json.dumps(ops, ensure_ascii=False).encode('utf-8'))
+        self.data[tk] = (ops, n); self.size += n
+        while self.size > self.max_bytes and len(self.data) > 1:
+            self.size -= self.data.popitem(last=False)[1][1]
+
+    def put(self, tk, path, v):
+        """path 에 replace 기록 — 같은 경로/하위 경로의 이전 패치는 덮어씀"""
+        p = _ptr(path)
+        ops = [o for o in self.get(tk) if o['path'] != p and not o['path'].startswith(p + '/')]
+        self.set(tk, ops + [{'op': 'replace', 'path': p, 'value': v}])
+
+    def drop(self, tk):
+        if tk in self.data: self.size -= self.data.pop(tk)[1]
+
+if 'json_drafts' not in st.session_state: st.session_state.json_drafts = DraftStore()
+
+def _json_base(sel):
+    """원본 설정 — 업로드된 JSON 파일, 없거나 깨졌으면 모델 정보로 생성 (매번 새 객체)"""
+    fi = store.get_model_file(sel['id'])
+    if fi:
+        try: return json.loads(store.blobs.read(fi['sha256']).decode('utf-8'))
+        except (ValueError, OSError): pass
+    return {
+        "data": [{
+            "ruleName": sel['name'],
+            "note": sel.get('summary',''),
+            "algorithm": sel['algorithm'].replace(" ","").lower(),
+            "algorithmSettings": json.loads(sel.get('parameters','{}')),
+            "logType": [sel['log_type'].lower()],
+            "formatTime": {"unit":"MINUTE","amount":"10"},
+            "datasetSettings": sel.get('dataset_settings',{}),
+            "fadingFactor": sel.get('trigger_settings',{}).get('fadingFactor',''),
+            "boundType": sel.get('trigger_settings',{}).get('boundType',''),
+            "sensitivity": sel.get('trigger_settings',{}).get('sensitivity',''),
+            "options": {
+                "mitre": [{"tacticsId":t,"techniquesId":""} for t in sel.get('mitre_tactics',[])]
+            }
+        }],
+        "rulegroups": [{"name": sel.get('detection_target','')}],
+        "fields": []
+    }
+
+def _json_doc(tk, sel):
+    """편집 중인 문서 — 세션에는 지금 열린 것 하나만 풀어 두고, 나머지는 패치로만 유지"""
+    w = st.session_state.json_work
+    if not w or w[0] != tk:
+        w = st.session_state.json_work = (tk, _jpatch(_json_base(sel), st.session_state.json_drafts.get(tk)))
+    return w[1]
+
+def _json_apply(tk, path, wk, sel):
+    """바뀐 하위 트리만 파싱해서 열린 문서와 초안 패치에 반영 (나머지는 다시 파싱하지 않음)"""
+    try: v = json.loads(st.session_state[wk])
+    except json.JSONDecodeError as e:
+        st.session_state[f"jerr_{tk}"] = (_jpath(path), str(e)); return
+    st.session_state.pop(f"jerr_{tk}", None)
+    doc, drafts = _json_doc(tk, sel), st.session_state.json_drafts
+    if path:
+        _jset(doc, path, v); drafts.put(tk, path, v)
+    else:
+        st.session_state.json_work = (tk, v); drafts.set(tk, list(_jdiff(_json_base(sel), v)))
+
+# ===== 설정 JSON 수집 (스트리밍) =====
+_ALG_MAP = {
+    "지도학습": ["Random Forest","SVM","Logistic Regression","XGBoost","Decision Tree"],
+    "비지도학습": ["RRCF","Isolation Forest","Autoencoder","DBSCAN","One-Class SVM"]
+}
+_ALG_NAMES = {'robustrandomcutforest':'RRCF','rrcf':'RRCF','isolationforest':'Isolation Forest','randomforest':'Random Forest','svm':'SVM','xgboost':'XGBoost','autoencoder':'Autoencoder','dbscan':'DBSCAN','decisiontree':'Decision Tree','logisticregression':'Logistic Regression','oneclasssvm':'One-Class SVM'}
+_ALG_TYPES = {**{a: '지도학습' for a in ['randomforest','svm','logisticregression','xgboost','decisiontree']},
+              **{a: '비지도학습' for a in ['isolationforest','robustrandomcutforest','rrcf','autoencoder','dbscan','oneclasssvm']}}
+_LOG_NAMES = {'fw':'Firewall','waf':'WAF','web':'WEB','ids':'IDS','ips':'IDS','syslog':'Syslog','network':'Network','edr':'EDR'}
+_JSON_WS = re.compile(r'[ \t\n\r]*')
+_JSON_NUM = frozenset('0123456789.eE+-')
+
+def _json_sections(fp, split=(), chunk=1 << 16):
+    """최상위 JSON 객체를 청크 단위로 읽으며 (키, 값) 을 내보냅니다.
+    split 에 든 키의 값이 배열이면 항목마다 (키, 항목) 으로 나눠 내보내므로 큰 배열도 한 번에 들고 있지 않습니다.
+    그 밖의 키는 값 전체를 한 번에 내보냅니다."""
+    dec, rd = json.JSONDecoder(), codecs.getincrementaldecoder('utf-8-sig')()
+    sc = {'buf': '', 'pos': 0, 'eof': False}
+
+    def more(n=chunk):
+        if sc['eof']: return False
+        b = fp.read(n)
+        sc['buf'] = sc['buf'][sc['pos']:] + rd.decode(b or b'', final=not b)
+        sc['pos'], sc['eof'] = 0, not b
+        return True
+
+    def peek():
+        while True:
+            sc['pos'] = _JSON_WS.match(sc['buf'], sc['pos']).end()
+            if sc['pos'] < len(sc['buf']): return sc['buf'][sc['pos']]
+            if not more(): raise ValueError("JSON 이 중간에 끝났습니다")
+
+    def expect(ch):
+        if peek() != ch: raise ValueError(f"'{ch}' 가 필요합니다 (위치 {sc['pos']})")
+        sc['pos'] += 1
+
+    def value():
+        peek()
+        while True:
+            try:
+                v, end = dec.raw_decode(sc['buf'], sc['pos'])
+                # 숫자는 뒤에 구분자가 보일 때까지 확정하지 않음 (청크 경계에서 "1." / "1e" 로 잘린 경우)
+                if sc['eof'] or end < len(sc['buf']) and (type(v) not in (int, float) or sc['buf'][end] not in _JSON_NUM):
+                    sc['pos'] = end; return v
+            except json.JSONDecodeError:
+                if sc['eof']: raise
+            more(max(chunk, len(sc['buf'])))   # 큰 항목은 읽는 양을 두 배씩 — 재시도 비용 선형 유지
+
+    if hasattr(fp, 'seek'): fp.seek(0)
+    more()
+    expect('{')
+    if peek() == '}': return
+    while True:
+        k = value()
+        if not isinstance(k, str): raise ValueError("객체 키는 문자열이어야 합니다")
+        expect(':')
+        if k in split and peek() == '[':
+            sc['pos'] += 1
+            if peek() == ']': sc['pos'] += 1
+            else:
+                while True:
+                    yield k, value()
+                    if peek() == ']': sc['pos'] += 1; break
+                    expect(',')
+        else:
+            yield k, value()
+        if peek() == '}': return
+        expect(',')
+
+def _rule_info(d, rg):
+    """data 항목 하나 + 대응 rulegroup → 등록 폼 자동 입력값"""
+    d = d if isinstance(d, dict) else {}
+    rg = rg if isinstance(rg, dict) else {}
+    return {
+        'ruleName': d.get('ruleName', ''),
+        'note': d.get('note', ''),
+        'ruleGroupName': rg.get('name', '') or d.get('ruleGroupName', ''),
+        'algorithm': d.get('algorithm', ''),
+        'algorithmSettings': d.get('algorithmSettings', {}),
+        'logType': d.get('logType', []),
+        'formatTime': d.get('formatTime', {}),
+        'datasetAnalyzeType': d.get('datasetAnalyzeType', ''),
+        'datasetSettings': d.get('datasetSettings', {}),
+        'fadingFactor': d.get('fadingFactor', ''),
+        'boundType': d.get('boundType', ''),
+        'sensitivity': d.get('sensitivity', ''),
+        'mitre_list': (d.get('options') or {}).get('mitre', []),
+        'raw': d
+    }
+
+def ingest_config(fp):
+    """설정 JSON 업로드 → {'rules': [규칙별 자동 입력값], 'rulegroups', 'fields', 'extra'(나머지 최상위 키)}
+    data 항목이 여러 개면 규칙마다 하나씩 만듭니다. 각 값은 파서가 만든 객체를 그대로 참조 (사본 없음)."""
+    data, groups, fields, extra = [], [], [], {}
+    order = []   # 원래 최상위 키 순서 (규칙별 파일을 다시 쓸 때 유지)
+    for k, v in _json_sections(fp, split=('data', 'rulegroups', 'fields')):
+        if k not in order: order.append(k)
+        if k == 'data': data.append(v)
+        elif k == 'rulegroups': groups.append(v)
+        elif k == 'fields': fields.append(v)
+        else: extra[k] = v
+    byname = {g.get('name'): g for g in groups if isinstance(g, dict)}
+    rules = []
+    for i, d in enumerate(data or [{}]):
+        rg = byname.get(d.get('ruleGroupName')) if isinstance(d, dict) else None
+        rules.append(_rule_info(d, rg or (groups[i] if groups and len(groups) == len(data) else groups[0] if groups else {})))
+    return {'rules': rules, 'rulegroups': groups, 'fields': fields, 'extra': extra, 'order': order}
+
+def _rule_config(ing, i):
+    """규칙 하나짜리 설정 파일 (data=[해당 규칙]) — 모델 파일로 저장"""
+    jd = ing['rules'][i]
+    rg = [g for g in ing['rulegroups'] if isinstance(g, dict) and g.get('name') == jd['ruleGroupName']] or ing['rulegroups'][:1]
+    sec = {'data': [jd['raw']], 'rulegroups': rg, 'fields': ing['fields']}
+    cfg = {k: sec[k] if k in sec else ing['extra'][k] for k in ing['order']}
+    for k, v in sec.items(): cfg.setdefault(k, v)
+    return json.dumps(cfg, indent=2, ensure_ascii=False).encode('utf-8')
+
+def _rule_fields(jd):
+    ds = jd.get('datasetSettings') or {}
+    return list(ds.get('features', [])) + list(ds.get('keyFields', [])) + list(ds.get('anomalySubject', ds.get('anomalySplit', [])))
+
+def _rule_dataset(jd):
+    return {"logType": jd.get('logType', []), "formatTime": jd.get('formatTime', {}),
+            "datasetAnalyzeType": jd.get('datasetAnalyzeType', ''), "datasetSettings": jd.get('datasetSettings', {})}
+
+def _rule_trigger(jd):
+    return {k: jd[k] for k in ['fadingFactor','boundType','sensitivity'] if jd.get(k, '') != ''}
+
+def _rule_mitre(jd, k):
+    ml = jd.get('mitre_list')
+    return [m.get(k) for m in ml if isinstance(m, dict) and m.get(k)] if isinstance(ml, list) else []
+
+def _rule_model(jd, size="0 MB"):
+    """규칙 자동 입력값 → 모델 레코드 (폼에서 값을 고치지 않고 그대로 등록할 때의 기본값)"""
+    alg = str(jd.get('algorithm', '')).lower()
+    mtype = _ALG_TYPES.get(alg, "지도학습")
+    lt = jd['logType'][0].lower() if isinstance(jd.get('logType'), list) and jd['logType'] else ''
+    today = datetime.now().strftime("%Y-%m-%d")
+    return {
+        'id': None, 'name': jd['ruleName'], 'algorithm': _ALG_NAMES.get(alg) if _ALG_NAMES.get(alg) in _ALG_MAP[mtype] else _ALG_MAP[mtype][0],
+        'type': mtype, 'log_type': _LOG_NAMES.get(lt, "WAF"), 'version': "v1.0.0", 'size': size,
+        'model_id': f"model_{uuid.uuid4().hex[:8]}", 'status': 'active',
+        'summary': jd.get('note', ''), 'description': '', 'detection_target': jd.get('ruleGroupName', ''),
+        'threat_tags': [], 'required_fields': _rule_fields(jd) or ["timestamp", "src_ip", "dst_ip"],
+        'created_at': today, 'updated_at': today, 'downloads': 0, 'views': 0, 'has_file': True,
+        'mitre_tactics': _rule_mitre(jd, 'tacticsId'), 'mitre_techniques': _rule_mitre(jd, 'techniquesId'),
+        'parameters': json.dumps(jd.get('algorithmSettings') or {}, indent=2, ensure_ascii=False), 'features': [],
+        'dataset_settings': _rule_dataset(jd), 'trigger_settings': _rule_trigger(jd)
+    }
+
+_ART_EXT = ('.pkl', '.h5', '.pt', '.pth', '.onnx', '.joblib')
+
+def _import_pairs(names):
+    """경로 목록 → ([(설정 json, 산출물|None)], [짝 없는 산출물]) — 같은 폴더·같은 파일명(확장자 제외)이면 짝"""
+    cfgs, arts = {}, {}
+    for n in names:
+        if n.endswith('/') or '__MACOSX' in n or os.path.basename(n).startswith('.'): continue
+        stem, ext = os.path.splitext(n)
+        if ext.lower() == '.json': cfgs[stem] = n
+        elif ext.lower() in _ART_EXT: arts[stem] = n
+    return [(cfgs[k], arts.get(k)) for k in sorted(cfgs)], sorted(v for k, v in arts.items() if k not in cfgs)
+
+def _import_one(cfg, art, opener):
+    """설정 하나 파싱·검증 + 파일 해시/기록 → [(모델, 파일 정보)] (작업 스레드에서 실행, 카탈로그는 건드리지 않음)"""
+    with opener(cfg) as f: ing = ingest_config(f)
+    bad = [str(i + 1) for i, r in enumerate(ing['rules']) if not r['ruleName']]
+    if bad: raise ValueError(f"ruleName 이 비어 있는 규칙: {', '.join(bad)}번")
+    fa = None
+    if art:
+        with opener(art) as f: sha, n = store.blobs.put(f)
+        fa = (os.path.basename(art), 'application/octet-stream', sha, n)
+    out = []
+    for i, r in enumerate(ing['rules']):
+        f = fa
+        if not f:
+            sha, n = store.blobs.put(_rule_config(ing, i))
+            f = (f"{r['ruleName']}_config.json", 'application/json', sha, n)
+        out.append((_rule_model(r, f"{f[3]/(1024*1024):.2f} MB"), f))
+    return out
 
 # ==========================================
 # 🚀 전체 페이지를 좌우 분할 화면으로 감싸기 (💡 비율 조절 완료)
@@ -500,29 +2078,41 @@ with hl:
         url_l = [x for x in _g("log_types","").split(",") if x]
         url_t = [x for x in _g("model_types","").split(",") if x]
         url_th = [x for x in _g("threats","").split(",") if x]
-        url_sort = _g("sort","updated")
+        url_st = _g("statuses", "active,test").split(",")
+        cur_q = st.session_state.get("ms", _g("search",""))
+        url_sort = _g("sort", "relevance" if cur_q else "updated")
+        if cur_q != st.session_state.get("_sort_q"):
+            # 검색어가 바뀌면 정렬을 기본값(검색 중이면 관련도순)으로 되돌림
+            st.session_state._sort_q = cur_q
+            st.session_state.pop("ss", None)
         
+        # 패싯 건수: 위젯보다 먼저 그려지므로 현재 선택값은 session_state 에서 읽음
+        cur_l, cur_t, cur_th = st.session_state.get("sl", url_l), st.session_state.get("st2", url_t), st.session_state.get("sth2", url_th)
+        cur_s = [s_ for s_, k in (('active','sa'),('test','ste'),('pending','sp')) if st.session_state.get(k, s_ in url_st)]
+        fc = store.facets(search=cur_q, statuses=cur_s, log_types=cur_l or None, types=cur_t or None, threats=cur_th or None)
+
         st.markdown("##### 로그 타입")
-        sel_l = st.multiselect("로그", ["WAF","WEB","Firewall","IDS","Syslog","Network","EDR"], default=url_l, key="sl", label_visibility="collapsed")
+        sel_l = st.multiselect("로그", _fo(["WAF","WEB","Firewall","IDS","Syslog","Network","EDR"], fc['log_type'], cur_l, url_l), default=url_l, key="sl", format_func=lambda x: f"{x} ({fc['log_type'].get(x,0)})", label_visibility="collapsed")
         st.markdown("##### 모델 유형")
-        sel_t = st.multiselect("유형", ["지도학습","비지도학습"], default=url_t, key="st2", label_visibility="collapsed")
+        sel_t = st.multiselect("유형", _fo(["지도학습","비지도학습"], fc['type'], cur_t, url_t), default=url_t, key="st2", format_func=lambda x: f"{x} ({fc['type'].get(x,0)})", label_visibility="collapsed")
         st.markdown("##### 위협 유형")
-        sel_th = st.multiselect("위협", ["SQL Injection","XSS","DDoS","Malware","Data Exfiltration","Brute Force","웹쉘","이상 트래픽","내부정보유출"], default=url_th, key="sth2", label_visibility="collapsed")
+        sel_th = st.multiselect("위협", _fo(["SQL Injection","XSS","DDoS","Malware","Data Exfiltration","Brute Force","웹쉘","이상 트래픽","내부정보유출"], fc['threat_tags'], cur_th, url_th), default=url_th, key="sth2", format_func=lambda x: f"{x} ({fc['threat_tags'].get(x,0)})", label_visibility="collapsed")
         st.markdown("---")
         st.markdown("##### 정렬")
-        sm = {"최신 업데이트순":"updated","등록일순":"created","다운로드순":"downloads","조회수순":"views","이름순":"name"}
-        di = list(sm.values()).index(url_sort) if url_sort in sm.values() else 0
+        sm = {"관련도순":"relevance","최신 업데이트순":"updated","등록일순":"created","다운로드순":"downloads","조회수순":"views","이름순":"name"}
+        di = list(sm.values()).index(url_sort) if url_sort in sm.values() else 1
         sb_sort = st.selectbox("정렬", list(sm.keys()), index=di, key="ss", label_visibility="collapsed")
         st.markdown("---")
         st.markdown("##### 상태")
-        sa = st.checkbox("사용 중", True, key="sa")
-        ste = st.checkbox("테스트", True, key="ste")
-        sp = st.checkbox("보류", False, key="sp")
+        sa = st.checkbox(f"사용 중 ({fc['status'].get('active',0)})", 'active' in url_st, key="sa")
+        ste = st.checkbox(f"테스트 ({fc['status'].get('test',0)})", 'test' in url_st, key="ste")
+        sp = st.checkbox(f"보류 ({fc['status'].get('pending',0)})", 'pending' in url_st, key="sp")
 
     elif menu == "docs" and page != "view":
         st.markdown("#### 📑 문서 카테고리")
-        cats = sorted(set([d['category'] for d in store["docs"]]))
-        sel_cat = st.selectbox("카테고리 선택", ["전체"] + cats, key="dc", label_visibility="collapsed")
+        cats = ["전체"] + store.doc_categories()
+        url_cat = _g("cat", "전체")
+        sel_cat = st.selectbox("카테고리 선택", cats, index=cats.index(url_cat) if url_cat in cats else 0, key="dc", label_visibility="collapsed")
 
 # ----------------- 우측 패널 (메인 콘텐츠 영역) -----------------
 with hr:
@@ -560,20 +2150,16 @@ with hr:
 
         st.markdown('<hr style="border:none;border-top:2px solid #e5e7eb;margin:40px 0 32px;">', unsafe_allow_html=True)
 
-        active = [m for m in store["models"] if m.get('status','active') == 'active']
-        cl, cr = st.columns(2)
-        with cl:
-            st.markdown('<div class="sec-h"><div class="sec-t">Recently Added <span class="sec-ts">최근 등록</span></div><a href="?menu=models&page=list&sort=created&auth=1" class="va-link" target="_parent">전체보기 →</a></div>', unsafe_allow_html=True)
-            for m in sorted(active, key=lambda x: x.get('created_at',''), reverse=True)[:4]:
-                st.markdown(_card(m, True), unsafe_allow_html=True)
-            if not active:
-                st.markdown('<div class="empty"><div class="empty-i">📦</div><div class="empty-t">등록된 모델이 없습니다</div></div>', unsafe_allow_html=True)
-        with cr:
-            st.markdown('<div class="sec-h"><div class="sec-t">Recently Updated <span class="sec-ts">최근 업데이트</span></div><a href="?menu=models&page=list&sort=updated&auth=1" class="va-link" target="_parent">전체보기 →</a></div>', unsafe_allow_html=True)
-            for m in sorted(active, key=lambda x: x.get('updated_at',''), reverse=True)[:4]:
-                st.markdown(_card(m), unsafe_allow_html=True)
-            if not active:
-                st.markdown('<div class="empty"><div class="empty-i">🔄</div><div class="empty-t">업데이트된 모델이 없습니다</div></div>', unsafe_allow_html=True)
+        recent_c = store.recent_models('created_at')
+        recent_u = store.recent_models('updated_at')
+        hc = '<div class="home-2c"><div>'
+        hc += '<div class="sec-h"><div class="sec-t">Recently Added <span class="sec-ts">최근 등록</span></div><a href="?menu=models&page=list&sort=created&auth=1" class="va-link" target="_parent">전체보기 →</a></div>'
+        hc += _grid(recent_c, 1, True) if recent_c else '<div class="empty"><div class="empty-i">📦</div><div class="empty-t">등록된 모델이 없습니다</div></div>'
+        hc += '</div><div>'
+        hc += '<div class="sec-h"><div class="sec-t">Recently Updated <span class="sec-ts">최근 업데이트</span></div><a href="?menu=models&page=list&sort=updated&auth=1" class="va-link" target="_parent">전체보기 →</a></div>'
+        hc += _grid(recent_u, 1) if recent_u else '<div class="empty"><div class="empty-i">🔄</div><div class="empty-t">업데이트된 모델이 없습니다</div></div>'
+        hc += '</div></div>'
+        st.markdown(hc, unsafe_allow_html=True)
 
     # ==================== Models 리스트 ====================
     elif menu == "models" and page == "list":
@@ -586,25 +2172,10 @@ with hr:
         if sa: allowed.append('active')
         if ste: allowed.append('test')
         if sp: allowed.append('pending')
-        fm = [m for m in store["models"] if m.get('status','active') in allowed]
-
-        if search_q:
-            q = search_q.lower()
-            fm = [m for m in fm if
-                  q in m['name'].lower() or
-                  q in m.get('summary','').lower() or
-                  q in m.get('description','').lower() or
-                  q in m.get('log_type','').lower() or
-                  q in m.get('algorithm','').lower() or
-                  q in m.get('detection_target','').lower() or
-                  any(q in t.lower() for t in m.get('threat_tags',[]))]
-        if sel_l: fm = [m for m in fm if m['log_type'] in sel_l]
-        if sel_t: fm = [m for m in fm if m['type'] in sel_t]
-        if sel_th: fm = [m for m in fm if any(t in m.get('threat_tags',[]) for t in sel_th)]
-
-        sf, sr = {"최신 업데이트순":('updated_at',True),"등록일순":('created_at',True),"다운로드순":('downloads',True),"조회수순":('views',True),"이름순":('name',False)}[sb_sort]
-        fm = sorted(fm, key=lambda x: x.get(sf,''), reverse=sr)
-        total = len(fm)
+        flt = dict(statuses=allowed, log_types=sel_l or None, types=sel_t or None, threats=sel_th or None, search=search_q)
+
+        sf, sr = {"관련도순":('relevance',True),"최신 업데이트순":('updated_at',True),"등록일순":('created_at',True),"다운로드순":('downloads',True),"조회수순":('views',True),"이름순":('name',False)}[sb_sort]
+        total = store.count_models(**flt)
 
         af = sel_l + sel_t + sel_th
         if search_q: af.insert(0, f"'{search_q}'")
@@ -616,31 +2187,43 @@ with hr:
         PER = 9
         tp = math.ceil(total/PER) if total > 0 else 1
         cp = max(1, min(int(_g("p","1")), tp))
-        pm = fm[(cp-1)*PER:cp*PER]
-
-        if not pm:
-            st.markdown('<div class="empty"><div class="empty-i">🔍</div><div class="empty-t">검색 결과가 없습니다</div></div>', unsafe_allow_html=True)
+        # 커서 모드: ?after= / ?before= 가 있으면 정렬 인덱스에서 바로 해당 페이지를 꺼냄 (offset 스캔 없음)
+        after, before = store.parse_cursor(_g("after"), sf), store.parse_cursor(_g("before"), sf)
+        keyset = sf in OrderIndex.KEYS
+        if keyset and (after or before):
+            pm = store.list_models(order=sf, desc=sr, limit=PER, after=after, before=before, **flt)
         else:
-            for i in range(0, len(pm), 3):
-                cols = st.columns(3)
-                for j in range(3):
-                    if i+j < len(pm):
-                        with cols[j]: st.markdown(_card(pm[i+j]), unsafe_allow_html=True)
+            pm = store.list_models(order=sf, desc=sr, limit=PER, offset=(cp-1)*PER, **flt)
 
+        gh = _grid(pm) if pm else '<div class="empty"><div class="empty-i">🔍</div><div class="empty-t">검색 결과가 없습니다</div></div>'
         if tp > 1:
-            bp = {k:v for k,v in dict(qp).items() if k != 'p'}
+            # 페이지 링크는 새로 로드되므로 현재 위젯 상태(검색어·필터·정렬)를 URL 에 그대로 실어 보냄
+            bp = {"menu": "models", "page": "list", "auth": "1", "sort": sm[sb_sort]}
+            for k_, v_ in (("search", search_q), ("log_types", ",".join(sel_l)), ("model_types", ",".join(sel_t)), ("threats", ",".join(sel_th))):
+                if v_: bp[k_] = v_
+            if allowed != ['active', 'test']: bp["statuses"] = ",".join(allowed)
+            def _pu(**kw): return "?" + urlencode({**bp, **kw})
             ph = '<div class="pg">'
-            for pn in range(max(1,cp-2), min(tp,cp+2)+1):
-                u = "?"+"&".join(f"{k}={v}" for k,v in {**bp,"p":str(pn)}.items())
-                ph += f'<span class="pg-b on">{pn}</span>' if pn==cp else f'<a href="{u}" class="pg-b" target="_parent">{pn}</a>'
+            if keyset and pm and cp > 1:
+                ph += f'<a href="{html.escape(_pu(p=cp-1, before=store.cursor_of(pm[0], sf)))}" class="pg-b" target="_parent">‹</a>'
+            if keyset and (after or before):
+                if cp > 1: ph += f'<a href="{html.escape(_pu(p=1))}" class="pg-b" target="_parent">1</a>'
+                ph += f'<span class="pg-b on">{cp}</span>'
+            else:
+                for pn in range(max(1,cp-2), min(tp,cp+2)+1):
+                    ph += f'<span class="pg-b on">{pn}</span>' if pn==cp else f'<a href="{html.escape(_pu(p=pn))}" class="pg-b" target="_parent">{pn}</a>'
+            if keyset and pm and cp < tp:
+                ph += f'<a href="{html.escape(_pu(p=cp+1, after=store.cursor_of(pm[-1], sf)))}" class="pg-b" target="_parent">›</a>'
             ph += '</div>'
-            st.markdown(ph, unsafe_allow_html=True)
+            gh += ph
+        st.markdown(gh, unsafe_allow_html=True)
 
     # ==================== 모델 상세 ====================
     elif menu == "models" and page == "detail" and model_id:
-        sel = next((m for m in store["models"] if str(m['id']) == str(model_id)), None)
+        sel = store.resolve_model(model_id)
         if sel:
-            sel['views'] = sel.get('views',0) + 1
+            _count_view('model', sel['id'])
+            counters.merged(sel, 'model')
 
             c1, c2 = st.columns([2,1])
             with c1:
@@ -659,13 +2242,46 @@ with hr:
                     st.markdown("#### ℹ️ 모델 정보")
                     for l,v in [("알고리즘",sel['algorithm']),("유형",sel['type']),("로그 타입",sel['log_type']),("버전",sel['version']),("크기",sel['size']),("등록일",sel['created_at']),("업데이트",sel['updated_at'])]:
                         st.markdown(f"**{l}:** {v}")
-                mc1,mc2 = st.columns(2)
+                mc1,mc2,mc3 = st.columns(3)
                 with mc1: st.metric("⬇️ 다운로드", sel['downloads'])
-                with mc2: st.metric("👁️ 조회수", sel['views'])
-                if sel.get('has_file') and sel['id'] in store["model_files"]:
-                    fi = store["model_files"][sel['id']]
-                    if st.download_button("⬇️ 다운로드", data=fi['data'], file_name=fi['filename'], mime=fi['type'], use_container_width=True, type="primary"):
+                with mc2: st.metric("👁️ 조회수", sel['views'], help=f"같은 브라우저의 {VIEW_WINDOW//60}분 내 재조회는 제외")
+                with mc3: st.metric("👤 고유 조회자", f"≈{counters.unique('model', sel['id']):,}", help="브라우저(쿠키, 없으면 IP + User-Agent) 기준 HyperLogLog 추정치 (오차 약 ±2%)")
+                fi = store.get_model_file(sel['id']) if sel.get('has_file') else None
+                if fi:
+                    # 파일 내용은 클릭했을 때만 읽음 — 큰 파일은 보조 서버가 해시로 직접 스트리밍 (다운로드 수도 거기서 기록)
+                    url = _file_url(f"/blob/{fi['sha256']}", name=fi['filename'], m=sel['id']) if fi['size'] > DOWNLOAD_INLINE_MAX else None
+                    if url:
+                        st.link_button("⬇️ 다운로드", url, use_container_width=True, type="primary")
+                    elif st.download_button("⬇️ 다운로드", data=lambda sha=fi['sha256']: store.blobs.read(sha), file_name=fi['filename'], mime=fi['type'], use_container_width=True, type="primary"):
+                        counters.incr('model', sel['id'], 'downloads')
                         sel['downloads'] += 1
+                    su = _file_url(f"/model/{quote(sel['model_id'])}")
+                    if su:
+                        with st.expander("🔗 센서용 직접 링크"):
+                            st.caption("Range 이어받기와 ETag(파일 해시) 캐시 검증을 지원합니다. 연결이 끊기면 같은 명령으로 이어받습니다. "
+                                       "보조 서버는 Hub 재시작 후 첫 페이지 접속 때 시작되므로, 재시작 뒤에는 UI 를 한 번 열어 주세요.")
+                            st.code(f'HUB_FILE_TOKEN={file_server.RequestHandlerClass.token}\ncurl -fC - -H "Authorization: Bearer $HUB_FILE_TOKEN" -o "{fi["filename"]}" "{su.split("?")[0]}"', language="bash")
+                vs = store.list_versions(sel['id'])
+                if len(vs) > 1:
+                    # 이전 버전 파일은 고를 때가 아니라 다운로드를 누를 때 델타에서 복원
+                    vi = st.selectbox("🕘 버전", range(len(vs)), format_func=lambda i: f"{vs[i]['version']} · {vs[i]['created_at']}" + (" (현재)" if i == 0 else ""), key=f"ver_{sel['id']}")
+                    v = vs[vi]
+                    if vi:
+                        vd = store.get_version(sel['id'], v['ver'])['doc']
+                        with st.expander(f"📋 {v['version']} 당시 정보"):
+                            # ✏️ 는 현재 정보와 달라진 항목
+                            for l, k_ in [("이름",'name'),("알고리즘",'algorithm'),("유형",'type'),("로그 타입",'log_type'),("상태",'status'),("업데이트",'updated_at')]:
+                                st.markdown(f"**{l}:** {vd.get(k_, '-')}" + (" ✏️" if vd.get(k_) != sel.get(k_) else ""))
+                            if vd.get('summary'): st.caption(vd['summary'])
+                    if vi and v['sha256']:
+                        st.caption(f"{v['filename']} · {v['size']/(1024*1024):.2f} MB · " + (f"{next((x['version'] for x in vs if x['ver'] == v['base_ver']), '')} 기준 델타로 저장" if v['delta_sha'] else "전체 저장"))
+                        vu = _file_url(f"/version/{sel['id']}/{v['ver']}") if v['size'] > DOWNLOAD_INLINE_MAX else None
+                        if vu:
+                            st.link_button(f"⬇️ {v['version']} 다운로드", vu, use_container_width=True)
+                        else:
+                            st.download_button(f"⬇️ {v['version']} 다운로드", data=lambda mid=sel['id'], n=v['ver']: store.read_version(mid, n), file_name=v['filename'], mime=v['type'], use_container_width=True, key=f"vdl_{sel['id']}_{v['ver']}")
+                    elif vi:
+                        st.caption("이 버전에는 파일이 없습니다.")
                 if st.button("📝 설정 파일 편집", use_container_width=True):
                     st.query_params.update({"menu":"models","page":"json_editor","model_id":str(model_id),"auth":"1"}); st.rerun()
                 with st.expander("💬 피드백"):
@@ -673,7 +2289,7 @@ with hr:
                     ft = st.text_area("의견", placeholder="이 모델에 대한 의견을 남겨주세요...")
                     if st.button("제출", use_container_width=True):
                         if ft.strip():
-                            store["feedback"].append({'model_id':sel['id'],'model_name':sel['name'],'rating':fr,'feedback':ft,'timestamp':datetime.now().strftime("%Y-%m-%d %H:%M:%S"),'user':user_name})
+                            store.add_feedback({'model_id':sel['id'],'model_name':sel['name'],'rating':fr,'feedback':ft,'timestamp':datetime.now().strftime("%Y-%m-%d %H:%M:%S"),'user':user_name})
                             st.success("✅ 제출 완료!"); st.rerun()
 
             st.markdown("<br>", unsafe_allow_html=True)
@@ -695,59 +2311,13 @@ with hr:
 
     # ==================== JSON 편집기 ====================
     elif menu == "models" and page == "json_editor" and model_id:
-        sel = next((m for m in store["models"] if str(m['id']) == str(model_id)), None)
+        sel = store.resolve_model(model_id)
         if sel:
             st.markdown(f"## 📝 설정 파일 편집: {sel['name']}")
             st.markdown("**임시 편집 모드** — 원본은 변경되지 않습니다. 편집 후 다운로드 버튼을 눌러 저장하세요.")
             
             tk = f"{user_name}_{model_id}"
             
-            if tk not in st.session_state.temp_json_editor:
-                if sel['id'] in store["model_files"]:
-                    try:
-                        uploaded_json = json.loads(store["model_files"][sel['id']]['data'].decode('utf-8'))
-                        st.session_state.temp_json_editor[tk] = uploaded_json
-                    except:
-                        st.session_state.temp_json_editor[tk] = {
-                            "data": [{
-                                "ruleName": sel['name'],
-                                "note": sel.get('summary',''),
-                                "algorithm": sel['algorithm'].replace(" ","").lower(),
-                                "algorithmSettings": json.loads(sel.get('parameters','{}')),
-                                "logType": [sel['log_type'].lower()],
-                                "formatTime": {"unit":"MINUTE","amount":"10"},
-                                "datasetSettings": sel.get('dataset_settings',{}),
-                                "fadingFactor": sel.get('trigger_settings',{}).get('fadingFactor',''),
-                                "boundType": sel.get('trigger_settings',{}).get('boundType',''),
-                                "sensitivity": sel.get('trigger_settings',{}).get('sensitivity',''),
-                                "options": {
-                                    "mitre": [{"tacticsId":t,"techniquesId":""} for t in sel.get('mitre_tactics',[])]
-                                }
-                            }],
-                            "rulegroups": [{"name": sel.get('detection_target','')}],
-                            "fields": []
-                        }
-                else:
-                    st.session_state.temp_json_editor[tk] = {
-                        "data": [{
-                            "ruleName": sel['name'],
-                            "note": sel.get('summary',''),
-                            "algorithm": sel['algorithm'].replace(" ","").lower(),
-                            "algorithmSettings": json.loads(sel.get('parameters','{}')),
-                            "logType": [sel['log_type'].lower()],
-                            "formatTime": {"unit":"MINUTE","amount":"10"},
-                            "datasetSettings": sel.get('dataset_settings',{}),
-                            "fadingFactor": sel.get('trigger_settings',{}).get('fadingFactor',''),
-                            "boundType": sel.get('trigger_settings',{}).get('boundType',''),
-                            "sensitivity": sel.get('trigger_settings',{}).get('sensitivity',''),
-                            "options": {
-                                "mitre": [{"tacticsId":t,"techniquesId":""} for t in sel.get('mitre_tactics',[])]
-                            }
-                        }],
-                        "rulegroups": [{"name": sel.get('detection_target','')}],
-                        "fields": []
-                    }
-            
             st.markdown('<div class="json-editor-card"><div class="json-editor-wrap"><div class="json-editor-terminal">', unsafe_allow_html=True)
             
             st.markdown(f'''
@@ -771,42 +2341,73 @@ with hr:
             </div>
             ''', unsafe_allow_html=True)
             
-            current_json = json.dumps(st.session_state.temp_json_editor[tk], indent=2, ensure_ascii=False)
+            doc = _json_doc(tk, sel)
+            big = isinstance(doc, dict) and sum(len(v) if isinstance(v, (list, dict)) else 1 for v in doc.values()) > JSON_SECTION_MIN
+            mode = st.radio("편집 방식", ["섹션", "전체"], index=0 if big else 1, horizontal=True, key=f"jmode_{tk}", on_change=_json_drop, args=(tk,))
             
+            # 섹션 모드: 최상위 키 → (리스트면) 항목 하나만 직렬화/편집
+            path = ()
+            if mode == "섹션" and isinstance(doc, dict) and doc:
+                s1, s2 = st.columns([2, 1])
+                k = s1.selectbox("섹션", list(doc), key=f"jsec_{tk}")
+                path = (k,)
+                if isinstance(doc[k], list) and doc[k]:
+                    n = len(doc[k])
+                    path = (k, int(s2.number_input(f"항목 (0–{n-1})", 0, n-1, 0, key=f"jidx_{tk}_{k}")))
+                st.caption(f"📍 `{_jpath(path)}`")
+            
+            wk = f"je_{tk}_{_jpath(path)}"
+            if wk not in st.session_state:
+                st.session_state[wk] = json.dumps(_jget(doc, path), indent=2, ensure_ascii=False)
             edited_json = st.text_area(
                 "JSON 편집",
-                value=current_json,
                 height=500,
-                key=f"json_edit_{tk}",
+                key=wk,
+                on_change=_json_apply,
+                args=(tk, path, wk, sel),
                 label_visibility="collapsed"
             )
             
-            search_term = st.session_state.get('json_search_term', '')
-            highlighted_html = highlight_json(edited_json, search_term)
+            # 구문 강조 보기는 켰을 때만, 검색 위치(또는 고른 시작 줄) 주변 JSON_HL_LINES 줄만 계산
+            if st.toggle("🎨 하이라이트 보기", key=f"hl_{tk}"):
+                search_term = st.text_input("검색", key="json_search_term", placeholder="강조할 문자열", label_visibility="collapsed")
+                nl = edited_json.count('\n') + 1
+                hits = _json_hits(edited_json, search_term) if search_term else []
+                if hits:
+                    hi = st.selectbox(f"일치 {len(hits):,}줄" + ("+" if len(hits) >= 1000 else ""), range(len(hits)), format_func=lambda i: f"{i+1}번째 · {hits[i]:,}줄", key=f"jhit_{tk}")
+                    start = max(1, hits[hi] - JSON_HL_LINES // 4)
+                elif nl > JSON_HL_LINES:
+                    start = int(st.number_input("시작 줄", 1, nl, 1, step=JSON_HL_LINES, key=f"jline_{tk}"))
+                else:
+                    start = 1
+                if nl > JSON_HL_LINES: st.caption(f"{start:,}–{min(nl, start + JSON_HL_LINES - 1):,} / {nl:,}줄")
+                st.markdown(f'<div class="json-editor-body">{highlight_json(edited_json, search_term, start)}</div>', unsafe_allow_html=True)
             
             st.markdown(f'</div></div></div>', unsafe_allow_html=True)
             
             c1,c2,c3 = st.columns([2,1,1])
             with c1:
-                try:
-                    pj = json.loads(edited_json)
-                    st.success("✅ JSON 유효")
-                    st.session_state.temp_json_editor[tk] = pj
-                except json.JSONDecodeError as e:
-                    st.error(f"❌ JSON 오류: {e}")
+                err = st.session_state.get(f"jerr_{tk}")
+                if err:
+                    st.error(f"❌ JSON 오류 (`{err[0]}`): {err[1]}")
                     pj = None
+                else:
+                    st.success("✅ JSON 유효")
+                    pj = doc
             
             with c2:
                 if st.button("🔄 초기화", key=f"reset_{tk}"):
-                    if tk in st.session_state.temp_json_editor:
-                        del st.session_state.temp_json_editor[tk]
+                    st.session_state.json_drafts.drop(tk)
+                    st.session_state.json_work = None
+                    st.session_state.pop(f"jerr_{tk}", None)
+                    _json_drop(tk)
                     st.rerun()
             
             with c3:
                 if pj:
                     st.download_button(
                         "💾 다운로드",
-                        data=json.dumps(pj, indent=2, ensure_ascii=False).encode('utf-8'),
+                        data=lambda: json.dumps(pj, indent=2, ensure_ascii=False).encode('utf-8'),
                         file_name=f"{sel['name'].replace(' ','_')}_config.json",
                         mime="application/json",
                         type="primary",
@@ -828,11 +2429,11 @@ with hr:
             """, unsafe_allow_html=True)
             st.session_state.open_register_tab = False
 
-        tab1,tab2,tab3,tab4 = st.tabs(["➕ 모델 등록","📊 모델 관리","💬 피드백","📋 통계"])
+        tab1,tab2,tab3,tab4,tab5 = st.tabs(["➕ 모델 등록","📊 모델 관리","💬 피드백","📋 통계","📦 가져오기/내보내기"])
 
         with tab1:
             if st.session_state.get('edit_mode') and st.session_state.get('editing_model_id'):
-                edit_model = next((m for m in store["models"] if m['id'] == st.session_state.editing_model_id), None)
+                edit_model = store.get_model(st.session_state.editing_model_id)
                 if edit_model:
                     st.markdown("### ✏️ 모델 수정")
                     st.info(f"'{edit_model['name']}' 모델을 수정하고 있습니다.")
@@ -858,37 +2459,34 @@ with hr:
                 uj = st.file_uploader("모델 설정 JSON 파일을 업로드하세요", type=['json'], key="json_up")
                 if uj:
                     try:
-                        raw = json.load(uj)
-                        d0 = raw.get('data', [{}])
-                        if isinstance(d0, list): d0 = d0[0] if d0 else {}
-                        rg = raw.get('rulegroups', [{}])
-                        if isinstance(rg, list): rg = rg[0] if rg else {}
-
-                        jd = {
-                            'ruleName': d0.get('ruleName', ''),
-                            'note': d0.get('note', ''),
-                            'ruleGroupName': rg.get('name', '') or d0.get('ruleGroupName', ''),
-                            'algorithm': d0.get('algorithm', ''),
-                            'algorithmSettings': d0.get('algorithmSettings', {}),
-                            'logType': d0.get('logType', []),
-                            'formatTime': d0.get('formatTime', {}),
-                            'datasetAnalyzeType': d0.get('datasetAnalyzeType', ''),
-                            'datasetSettings': d0.get('datasetSettings', {}),
-                            'fadingFactor': d0.get('fadingFactor', ''),
-                            'boundType': d0.get('boundType', ''),
-                            'sensitivity': d0.get('sensitivity', ''),
-                            'mitre_list': d0.get('options', {}).get('mitre', []),
-                            'fields': raw.get('fields', []),
-                            'raw_json': raw
-                        }
-                        st.session_state['_jd_cache'] = jd
-                        st.success(f"✅ 파일 로드 완료! 모델명: **{jd['ruleName']}**")
-                        with st.expander("📋 파싱된 주요 정보"):
-                            st.json({k:v for k,v in jd.items() if k not in ['fields', 'raw_json']})
+                        jc = st.session_state.get('_jd_cache')
+                        if not jc or jc['sig'] != uj.file_id:   # 같은 업로드는 rerun 마다 다시 파싱하지 않음
+                            jc = st.session_state['_jd_cache'] = {'sig': uj.file_id, 'ing': ingest_config(uj), 'i': 0}
+                        rules = jc['ing']['rules']
+                        if len(rules) > 1:
+                            st.success(f"✅ 파일 로드 완료! 규칙 **{len(rules)}개**가 들어 있습니다.")
+                            b1, b2 = st.columns([3, 1])
+                            jc['i'] = b1.selectbox("폼에 불러올 규칙", range(len(rules)), format_func=lambda i: f"{i+1}. {rules[i]['ruleName'] or '(이름 없음)'}", key="json_rule")
+                            if b2.button(f"📦 {len(rules)}개 모두 등록", use_container_width=True, key="json_bulk"):
+                                for i, r in enumerate(rules):
+                                    cfg = _rule_config(jc['ing'], i)
+                                    m = _rule_model(r, f"{len(cfg)/(1024*1024):.2f} MB")
+                                    mid = store.add_model(m)
+                                    store.put_model_file(mid, f"{m['name']}_config.json", cfg, 'application/json')
+                                    store.snapshot_version(mid)
+                                del st.session_state['_jd_cache']
+                                st.success(f"✅ 규칙 {len(rules)}개를 모델로 등록했습니다.")
+                                rules = None
+                        jd = rules[jc['i']] if rules else None
+                        if jd:
+                            if len(rules) == 1: st.success(f"✅ 파일 로드 완료! 모델명: **{jd['ruleName']}**")
+                            with st.expander("📋 파싱된 주요 정보"):
+                                st.json({**{k:v for k,v in jd.items() if k != 'raw'}, 'fields': f"{len(jc['ing']['fields'])}개"})
                     except Exception as e:
                         st.error(f"❌ JSON 파싱 오류: {e}")
                 elif '_jd_cache' in st.session_state:
-                    jd = st.session_state['_jd_cache']
+                    jc = st.session_state['_jd_cache']
+                    jd = jc['ing']['rules'][jc['i']]
                 st.markdown("#### 2️⃣ 자동 입력된 정보 확인 및 수정")
             else:
                 st.markdown("#### 모델 정보 입력")
@@ -897,7 +2495,7 @@ with hr:
 
             edit_model = None
             if st.session_state.get('edit_mode') and st.session_state.get('editing_model_id'):
-                edit_model = next((m for m in store["models"] if m['id'] == st.session_state.editing_model_id), None)
+                edit_model = store.get_model(st.session_state.editing_model_id)
 
             with st.form("reg_form"):
                 c1, c2 = st.columns(2)
@@ -917,24 +2515,16 @@ with hr:
                         if edit_model.get('type') in type_opts:
                             auto_type_idx = type_opts.index(edit_model['type'])
                     elif jd:
-                        alg = jd.get('algorithm','').lower()
-                        if alg in ['randomforest','svm','logisticregression','xgboost','decisiontree']:
-                            auto_type_idx = 0
-                        elif alg in ['isolationforest','robustrandomcutforest','rrcf','autoencoder','dbscan','oneclasssvm']:
-                            auto_type_idx = 1
+                        auto_type_idx = type_opts.index(_ALG_TYPES.get(jd.get('algorithm','').lower(), "지도학습"))
                     model_type = st.selectbox("모델 유형 *", type_opts, index=auto_type_idx)
 
-                    alg_map = {
-                        "지도학습": ["Random Forest","SVM","Logistic Regression","XGBoost","Decision Tree"],
-                        "비지도학습": ["RRCF","Isolation Forest","Autoencoder","DBSCAN","One-Class SVM"]
-                    }
+                    alg_map = _ALG_MAP
                     auto_alg_idx = 0
                     if edit_model:
                         if edit_model.get('algorithm') in alg_map[model_type]:
                             auto_alg_idx = alg_map[model_type].index(edit_model['algorithm'])
                     elif jd:
-                        name_map = {'robustrandomcutforest':'RRCF','rrcf':'RRCF','isolationforest':'Isolation Forest','randomforest':'Random Forest','svm':'SVM','xgboost':'XGBoost','autoencoder':'Autoencoder','dbscan':'DBSCAN','decisiontree':'Decision Tree','logisticregression':'Logistic Regression','oneclasssvm':'One-Class SVM'}
-                        mapped = name_map.get(jd.get('algorithm','').lower(), '')
+                        mapped = _ALG_NAMES.get(jd.get('algorithm','').lower(), '')
                         if mapped in alg_map[model_type]:
                             auto_alg_idx = alg_map[model_type].index(mapped)
                     algorithm = st.selectbox("알고리즘 *", alg_map[model_type], index=auto_alg_idx)
@@ -947,8 +2537,7 @@ with hr:
                             auto_log_idx = log_opts.index(edit_model['log_type'])
                     elif jd and jd.get('logType'):
                         lt = jd['logType'][0].lower() if isinstance(jd['logType'], list) and jd['logType'] else ''
-                        lmap = {'fw':'Firewall','waf':'WAF','web':'WEB','ids':'IDS','ips':'IDS','syslog':'Syslog','network':'Network','edr':'EDR'}
-                        ml = lmap.get(lt, '')
+                        ml = _LOG_NAMES.get(lt, '')
                         if ml in log_opts: auto_log_idx = log_opts.index(ml)
                     log_type = st.selectbox("로그 타입 *", log_opts, index=auto_log_idx)
 
@@ -962,17 +2551,15 @@ with hr:
                     m_tactics_val = ''
                     if edit_model:
                         m_tactics_val = ', '.join(edit_model.get('mitre_tactics', []))
-                    elif jd and jd.get('mitre_list') and isinstance(jd['mitre_list'], list):
-                        tacs = [m.get('tacticsId','') for m in jd['mitre_list'] if isinstance(m,dict) and m.get('tacticsId')]
-                        m_tactics_val = ', '.join(tacs)
+                    elif jd:
+                        m_tactics_val = ', '.join(_rule_mitre(jd, 'tacticsId'))
                     mitre_tactics = st.text_input("MITRE Tactics", value=m_tactics_val)
                     
                     m_tech_val = ''
                     if edit_model:
                         m_tech_val = ', '.join(edit_model.get('mitre_techniques', []))
-                    elif jd and jd.get('mitre_list') and isinstance(jd['mitre_list'], list):
-                        techs = [m.get('techniquesId','') for m in jd['mitre_list'] if isinstance(m,dict) and m.get('techniquesId')]
-                        m_tech_val = ', '.join(techs)
+                    elif jd:
+                        m_tech_val = ', '.join(_rule_mitre(jd, 'techniquesId'))
                     mitre_techniques = st.text_input("MITRE Techniques", value=m_tech_val)
 
                     default_summary = edit_model.get('summary', '') if edit_model else (jd['note'] if jd else '')
@@ -1001,13 +2588,8 @@ with hr:
                         auto_fields = ""
                         if edit_model:
                             auto_fields = ", ".join(edit_model.get('required_fields', []))
-                        elif jd and jd.get('datasetSettings'):
-                            ds = jd['datasetSettings']
-                            parts = []
-                            parts.extend(ds.get('features', []))
-                            parts.extend(ds.get('keyFields', []))
-                            parts.extend(ds.get('anomalySubject', ds.get('anomalySplit', [])))
-                            auto_fields = ", ".join(parts) if parts else ""
+                        elif jd:
+                            auto_fields = ", ".join(_rule_fields(jd))
                         req_fields = st.text_area("필수 로그 필드 (쉼표 구분)", value=auto_fields or "timestamp, src_ip, dst_ip")
 
                     with cb:
@@ -1015,21 +2597,14 @@ with hr:
                         if edit_model:
                             auto_ds = edit_model.get('dataset_settings', {})
                         elif jd:
-                            auto_ds = {
-                                "logType": jd.get('logType', []),
-                                "formatTime": jd.get('formatTime', {}),
-                                "datasetAnalyzeType": jd.get('datasetAnalyzeType', ''),
-                                "datasetSettings": jd.get('datasetSettings', {})
-                            }
+                            auto_ds = _rule_dataset(jd)
                         dataset_cfg = st.text_area("데이터셋 설정 (JSON)", value=json.dumps(auto_ds, indent=2, ensure_ascii=False) if auto_ds else '{}', height=120)
 
                         auto_tr = {}
                         if edit_model:
                             auto_tr = edit_model.get('trigger_settings', {})
                         elif jd:
-                            for k in ['fadingFactor','boundType','sensitivity']:
-                                v = jd.get(k, '')
-                                if v != '': auto_tr[k] = v
+                            auto_tr = _rule_trigger(jd)
                         trigger_cfg = st.text_area("트리거 설정 (JSON)", value=json.dumps(auto_tr, indent=2, ensure_ascii=False) if auto_tr else '{}', height=100)
 
                 submit_label = "💾 수정 완료" if edit_model else "📦 모델 등록"
@@ -1038,6 +2613,7 @@ with hr:
                 if submitted:
                     if model_name and detection_target and threat_tags and summary:
                         if edit_model:
+                            store.snapshot_version(edit_model['id'])   # 수정 전 상태가 버전 목록에 없으면 먼저 남김
                             edit_model['name'] = model_name
                             edit_model['algorithm'] = algorithm
                             edit_model['type'] = model_type
@@ -1059,16 +2635,14 @@ with hr:
                                 edit_model['size'] = file_size
                                 edit_model['has_file'] = True
                                 
-                                store["model_files"][edit_model['id']] = {
-                                    'filename': uploaded_file.name,
-                                    'data': uploaded_file.getvalue(),
-                                    'type': uploaded_file.type
-                                }
+                                store.put_model_file(edit_model['id'], uploaded_file.name, uploaded_file, uploaded_file.type)
                             
                             try:
                                 if dataset_cfg: edit_model['dataset_settings'] = json.loads(dataset_cfg)
                                 if trigger_cfg: edit_model['trigger_settings'] = json.loads(trigger_cfg)
                             except: pass
+                            store.update_model(edit_model)
+                            store.snapshot_version(edit_model['id'])
                             
                             st.success(f"✅ '{model_name}' 수정 완료!")
                             st.session_state.edit_mode = False
@@ -1077,30 +2651,18 @@ with hr:
                                 del st.session_state['_jd_cache']
                         
                         else:
-                            new_id = max([m['id'] for m in store["models"]], default=0) + 1
                             file_size = "0 MB"
                             if uploaded_file:
                                 file_size = f"{uploaded_file.size/(1024*1024):.2f} MB"
-                                store["model_files"][new_id] = {
-                                    'filename': uploaded_file.name,
-                                    'data': uploaded_file.getvalue(),
-                                    'type': uploaded_file.type
-                                }
-                            elif jd and 'raw_json' in jd:
-                                store["model_files"][new_id] = {
-                                    'filename': f"{model_name}_config.json",
-                                    'data': json.dumps(jd['raw_json'], indent=2, ensure_ascii=False).encode('utf-8'),
-                                    'type': 'application/json'
-                                }
 
                             new_model = {
-                                'id': new_id, 'name': model_name, 'algorithm': algorithm, 'type': model_type,
+                                'id': None, 'name': model_name, 'algorithm': algorithm, 'type': model_type,
                                 'log_type': log_type, 'version': model_version, 'size': file_size,
                                 'model_id': f"model_{uuid.uuid4().hex[:8]}", 'status': model_status,
                                 'summary': summary, 'description': detailed_desc, 'detection_target': detection_target,
                                 'threat_tags': threat_tags, 'required_fields': [f.strip() for f in req_fields.split(',') if f.strip()],
                                 'created_at': datetime.now().strftime("%Y-%m-%d"), 'updated_at': datetime.now().strftime("%Y-%m-%d"),
-                                'downloads': 0, 'views': 0, 'has_file': uploaded_file is not None or (jd and 'raw_json' in jd),
+                                'downloads': 0, 'views': 0, 'has_file': uploaded_file is not None or jd is not None,
                                 'mitre_tactics': [t.strip() for t in mitre_tactics.split(',') if t.strip()],
                                 'mitre_techniques': [t.strip() for t in mitre_techniques.split(',') if t.strip()],
                                 'parameters': model_params, 'features': []
@@ -1110,7 +2672,13 @@ with hr:
                                 if trigger_cfg: new_model['trigger_settings'] = json.loads(trigger_cfg)
                             except: pass
 
-                            store["models"].append(new_model)
+                            new_id = store.add_model(new_model)
+                            if uploaded_file:
+                                store.put_model_file(new_id, uploaded_file.name, uploaded_file, uploaded_file.type)
+                            elif jd:
+                                jc = st.session_state['_jd_cache']
+                                store.put_model_file(new_id, f"{model_name}_config.json", _rule_config(jc['ing'], jc['i']), 'application/json')
+                            store.snapshot_version(new_id)
                             st.success(f"✅ '{model_name}' 등록 완료!")
                             if '_jd_cache' in st.session_state:
                                 del st.session_state['_jd_cache']
@@ -1120,14 +2688,14 @@ with hr:
         with tab2: 
             st.markdown("### 등록된 모델 관리")
             if st.session_state.get('edit_mode') and st.session_state.get('editing_model_id'):
-                editing = next((m for m in store["models"] if m['id'] == st.session_state.editing_model_id), None)
+                editing = store.get_model(st.session_state.editing_model_id)
                 if editing:
                     st.info(f"✏️ '{editing['name']}' 수정 모드입니다. 상단 '➕ 모델 등록' 탭에서 내용을 수정해 주세요.")
-            if not store["models"]:
+            if not store.count_models():
                 st.info("등록된 모델이 없습니다.")
             else:
                 sf = st.selectbox("상태", ["전체","active","pending","test"], format_func=lambda x: {"전체":"전체","active":"사용","pending":"보류","test":"테스트"}.get(x,x))
-                ml = store["models"] if sf == "전체" else [m for m in store["models"] if m.get('status','active') == sf]
+                ml = store.list_models() if sf == "전체" else store.list_models(statuses=[sf])
                 
                 for model in ml:
                     with st.container(border=True):
@@ -1148,7 +2716,7 @@ with hr:
                             
                             ns = st.selectbox("상태",["active","pending","test"],index=["active","pending","test"].index(model.get('status','active')),format_func=lambda x:{"active":"사용","pending":"보류","test":"테스트"}[x],key=f"st_{model['id']}")
                             if ns != model.get('status','active'):
-                                model['status'] = ns; model['updated_at'] = datetime.now().strftime("%Y-%m-%d"); st.rerun()
+                                model['status'] = ns; model['updated_at'] = datetime.now().strftime("%Y-%m-%d"); store.update_model(model); st.rerun()
                             
                             if st.button("🗑️ 삭제", key=f"d_{model['id']}", use_container_width=True):
                                 st.session_state[f"cd_{model['id']}"] = True
@@ -1158,9 +2726,7 @@ with hr:
                                 dc1,dc2 = st.columns(2)
                                 with dc1:
                                     if st.button("확인",key=f"cf_{model['id']}",type="primary"):
-                                        store["models"] = [m for m in store["models"] if m['id']!=model['id']]
-                                        if model['id'] in store["model_files"]:
-                                            del store["model_files"][model['id']]
+                                        store.delete_model(model['id'])
                                         st.rerun()
                                 with dc2:
                                     if st.button("취소",key=f"cc_{model['id']}"):
@@ -1168,35 +2734,96 @@ with hr:
 
         with tab3:
             st.markdown("### 피드백")
-            if not store["feedback"]: st.info("피드백이 없습니다.")
+            nfb, avg = store.feedback_summary()
+            if not nfb: st.info("피드백이 없습니다.")
             else:
-                avg = sum(f['rating'] for f in store["feedback"]) / len(store["feedback"])
                 fc1,fc2 = st.columns(2)
-                with fc1: st.metric("총 피드백", f"{len(store['feedback'])}개")
+                with fc1: st.metric("총 피드백", f"{nfb}개")
                 with fc2: st.metric("평균 평점", f"{avg:.1f}/5.0")
-                for fb in reversed(store["feedback"]):
+                for fb in store.list_feedback():
                     with st.container(border=True):
                         st.markdown(f"**{fb['model_name']}** — {'⭐'*fb['rating']}")
                         st.markdown(f"_{fb['feedback']}_ ({fb['user']}, {fb['timestamp']})")
 
         with tab4:
             st.markdown("### 📊 통계")
+            ms = store.model_stats()
             c1,c2,c3,c4 = st.columns(4)
-            with c1: st.metric("전체", len(store["models"]))
-            with c2: st.metric("사용 중", len([m for m in store["models"] if m.get('status','active')=='active']))
-            with c3: st.metric("다운로드", f"{sum(m.get('downloads',0) for m in store['models']):,}")
-            with c4: st.metric("조회수", f"{sum(m.get('views',0) for m in store['models']):,}")
-            if store["models"]:
+            with c1: st.metric("전체", ms['total'])
+            with c2: st.metric("사용 중", ms['active'])
+            with c3: st.metric("다운로드", f"{ms['downloads']:,}")
+            with c4: st.metric("조회수", f"{ms['views']:,}")
+            ch, cm = card_cache.hits, card_cache.misses
+            st.caption(f"카드 렌더 캐시: hit {ch:,} / miss {cm:,} ({ch/(ch+cm)*100 if ch+cm else 0:.1f}%) · {len(card_cache.data):,}개 보관")
+            ss = store.storage_stats()
+            if ss['files']:
+                s1,s2,s3 = st.columns(3)
+                with s1: st.metric("저장된 아티팩트", f"{ss['files']:,}개", f"{ss['stored']/(1024*1024):.2f} MB", delta_color="off")
+                with s2: st.metric("압축률", f"{ss['raw']/ss['stored'] if ss['stored'] else 1:.1f}배")
+                with s3: st.metric("절약된 용량", f"{(ss['raw']-ss['stored'])/(1024*1024):.2f} MB", f"원본 {ss['raw']/(1024*1024):.2f} MB", delta_color="off")
+                st.caption("코덱별 아티팩트 수: " + " · ".join(f"{k} {v:,}" for k, v in sorted(ss['by_codec'].items())) + f" (신규 저장 코덱: {store.blobs.codec})")
+            if ms['total']:
                 cc1,cc2 = st.columns(2)
                 with cc1:
-                    lc = {}
-                    for m in store["models"]: lc[m['log_type']] = lc.get(m['log_type'],0)+1
+                    lc = ms['by_log_type']
                     st.bar_chart(pd.DataFrame(list(lc.items()), columns=['타입','수']).set_index('타입'))
                 with cc2:
-                    tc = {}
-                    for m in store["models"]: tc[m['type']] = tc.get(m['type'],0)+1
+                    tc = ms['by_type']
                     st.bar_chart(pd.DataFrame(list(tc.items()), columns=['유형','수']).set_index('유형'))
 
+        with tab5:
+            st.markdown("### 📦 일괄 가져오기")
+            st.caption(f"설정 JSON 과 같은 이름의 모델 파일({', '.join(_ART_EXT)})을 짝지어 등록합니다. 설정 하나에 규칙이 여러 개면 규칙마다 모델이 만들어집니다.")
+            src = st.radio("가져올 위치", ["zip 업로드", "서버 디렉터리"], horizontal=True, key="imp_src")
+            zf = root = None
+            if src == "zip 업로드":
+                zu = st.file_uploader("설정/모델 파일 묶음 (zip)", type=['zip'], key="imp_zip")
+                if zu:
+                    try: zf = zipfile.ZipFile(zu)
+                    except zipfile.BadZipFile as e: st.error(f"❌ zip 파일 오류: {e}")
+            else:
+                root = st.text_input("디렉터리 경로", key="imp_dir", placeholder="/data/rules_export").strip()
+                if root and not os.path.isdir(root):
+                    st.error("❌ 디렉터리를 찾을 수 없습니다."); root = None
+            if zf or root:
+                if zf:
+                    names, opener = zf.namelist(), zf.open
+                else:
+                    names = [os.path.relpath(os.path.join(d, f), root).replace(os.sep, '/') for d, _, fs in os.walk(root) for f in fs]
+                    opener = lambda p: open(os.path.join(root, p), 'rb')
+                pairs, orphans = _import_pairs(names)
+                st.info(f"설정 파일 {len(pairs):,}개 (모델 파일 짝 {sum(1 for _, a in pairs if a):,}개) · 짝 없는 모델 파일 {len(orphans):,}개")
+                if pairs and st.button("🚀 가져오기", type="primary", key="imp_go"):
+                    # 파싱·검증·해시는 스레드 풀에서, 카탈로그 반영은 마지막에 한 트랜잭션으로
+                    done, errs = {}, [{'파일': a, '오류': '짝이 되는 설정 JSON 없음'} for a in orphans]
+                    bar = st.progress(0.0, text="준비 중…")
+                    with ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 2) * 2)) as ex:
+                        futs = {ex.submit(_import_one, c, a, opener): c for c, a in pairs}
+                        for n, fu in enumerate(as_completed(futs), 1):
+                            try: done[futs[fu]] = fu.result()
+                            except Exception as e: errs.append({'파일': futs[fu], '오류': str(e) or type(e).__name__})
+                            bar.progress(n / len(pairs), text=f"처리 중… {n:,}/{len(pairs):,}")
+                    batch = [x for c, _ in pairs for x in done.get(c, [])]   # id 는 파일 순서대로
+                    if batch:
+                        bar.progress(1.0, text=f"카탈로그에 {len(batch):,}개 기록 중…")
+                        store.add_models(batch)
+                    bar.empty()
+                    st.success(f"✅ 모델 {len(batch):,}개 등록 · 오류 {len(errs):,}건")
+                    if errs:
+                        st.dataframe(pd.DataFrame(errs), use_container_width=True, hide_index=True)
+
+            st.markdown("### 📤 카탈로그 내보내기")
+            nd, zp = _file_url("/export.ndjson"), _file_url("/export.zip")
+            if nd:
+                st.caption("모델·피드백·문서를 한 줄에 하나씩(NDJSON) 스트리밍합니다. zip 에는 참조된 모델 파일이 artifacts/<sha256> 로 함께 들어갑니다.")
+                e1, e2 = st.columns(2)
+                e1.link_button("📄 NDJSON", nd, use_container_width=True)
+                e2.link_button("🗜️ zip (모델 파일 포함)", zp, use_container_width=True)
+                st.code(f'HUB_FILE_TOKEN={file_server.RequestHandlerClass.token}\ncurl -H "Authorization: Bearer $HUB_FILE_TOKEN" -o catalog.zip "{zp.split("?")[0]}"', language="bash")
+                st.caption("토큰은 HUB_FILE_TOKEN 환경변수로 지정할 수 있고, 없으면 처음 만든 값이 DB 에 저장되어 재시작 후에도 유지됩니다.")
+            else:
+                st.info("보조 파일 서버가 꺼져 있어 내보내기를 사용할 수 없습니다 (HUB_FILE_PORT).")
+
     # ==================== 공지사항 ====================
     elif menu == "notice":
         st.markdown("## 공지사항")
@@ -1219,46 +2846,45 @@ with hr:
         st.caption("IGLOO AI Model Hub 사용 가이드 및 기술 문서")
         st.markdown("<br>", unsafe_allow_html=True)
 
-        # sel_cat 값은 이미 상단 좌측 패널 로직에서 설정됨
-        dl = store["docs"] if sel_cat == "전체" else [d for d in store["docs"] if d['category'] == sel_cat]
+        # sel_cat 값은 이미 상단 좌측 패널 로직에서 설정됨 — 문서 목록은 표 하나(HTML)로 그리고 제목은 직접 링크
+        cat = None if sel_cat == "전체" else sel_cat
+        DPER = 20
+        dtotal = store.count_docs(cat)
+        dtp = math.ceil(dtotal/DPER) if dtotal > 0 else 1
+        dcp = max(1, min(int(_g("dp","1")), dtp)) if sel_cat == _g("cat","전체") else 1
+        dl = store.list_docs(cat, limit=DPER, offset=(dcp-1)*DPER)
 
         if dl:
-            st.markdown("---")
-            hc = st.columns([0.4, 4.5, 1.2, 1, 1, 0.6])
-            with hc[0]: st.markdown("**#**")
-            with hc[1]: st.markdown("**제목**")
-            with hc[2]: st.markdown("**카테고리**")
-            with hc[3]: st.markdown("**작성자**")
-            with hc[4]: st.markdown("**작성일**")
-            with hc[5]: st.markdown("**조회**")
-            st.markdown("---")
-
+            e = html.escape
+            th = '<table class="doc-t"><thead><tr><th>#</th><th>제목</th><th>카테고리</th><th>작성자</th><th>작성일</th><th>조회</th></tr></thead><tbody>'
             for doc in dl:
-                rc = st.columns([0.4, 4.5, 1.2, 1, 1, 0.6])
-                with rc[0]: st.caption(str(doc['id']))
-                with rc[1]:
-                    fi = " 📎" if doc.get('file_attached') else ""
-                    if st.button(f"{doc['title']}{fi}", key=f"doc_{doc['id']}"):
-                        st.query_params.update({"menu":"docs","page":"view","doc_id":str(doc['id']),"auth":"1"})
-                        st.rerun()
-                with rc[2]: st.caption(doc['category'])
-                with rc[3]: st.caption(doc['author'])
-                with rc[4]: st.caption(doc['date'])
-                with rc[5]: st.caption(str(doc['views']))
+                counters.merged(doc, 'doc')
+                fi = " 📎" if doc.get('file_attached') else ""
+                th += (f'<tr><td class="doc-n">{doc["id"]}</td><td><a href="?menu=docs&page=view&doc_id={doc["id"]}&auth=1" target="_parent">{e(doc["title"])}{fi}</a></td>'
+                       f'<td>{e(doc["category"])}</td><td>{e(doc["author"])}</td><td>{doc["date"]}</td><td class="doc-n">{doc["views"]}</td></tr>')
+            th += '</tbody></table>'
+            if dtp > 1:
+                th += '<div class="pg">'
+                for pn in range(max(1,dcp-2), min(dtp,dcp+2)+1):
+                    u = e("?" + urlencode({"menu":"docs","cat":sel_cat,"dp":pn,"auth":"1"}))
+                    th += f'<span class="pg-b on">{pn}</span>' if pn==dcp else f'<a href="{u}" class="pg-b" target="_parent">{pn}</a>'
+                th += '</div>'
+            st.markdown(th, unsafe_allow_html=True)
         else:
             st.markdown('<div class="empty"><div class="empty-i">📄</div><div class="empty-t">등록된 문서가 없습니다</div></div>', unsafe_allow_html=True)
 
     elif menu == "docs" and _g("page","") == "view":
         did = int(_g("doc_id","0"))
-        doc = next((d for d in store["docs"] if d['id'] == did), None)
+        doc = store.get_doc(did)
         if doc:
-            doc['views'] += 1
+            _count_view('doc', did)
+            counters.merged(doc, 'doc')
             st.markdown(f"## {doc['title']}")
-            st.markdown(f"**{doc['category']}** · {doc['author']} · {doc['date']} · 조회 {doc['views']}")
+            st.markdown(f"**{doc['category']}** · {doc['author']} · {doc['date']} · 조회 {doc['views']} · 고유 조회자 ≈{counters.unique('doc', did):,}")
             st.markdown("---")
             st.markdown(doc['content'])
             if doc.get('file_attached'):
-                st.download_button("📎 첨부파일", data=doc['content'].encode('utf-8'), file_name=f"{doc['title']}.md", mime="text/markdown")
+                st.download_button("📎 첨부파일", data=lambda c=doc['content']: c.encode('utf-8'), file_name=f"{doc['title']}.md", mime="text/markdown")
         else:
             st.error("문서를 찾을 수 없습니다.")
 
@@ -1272,6 +2898,6 @@ with hr:
             dfile = st.file_uploader("첨부파일 (선택)", type=['pdf','docx','txt','md','json','zip'])
             if st.form_submit_button("📋 문서 등록", type="primary"):
                 if dt and dcont:
-                    store["docs"].append({'id':len(store["docs"])+1,'title':dt,'category':dcat,'author':user_name,'date':datetime.now().strftime("%Y-%m-%d"),'views':0,'content':dcont,'file_attached':dfile is not None})
+                    store.add_doc({'id':None,'title':dt,'category':dcat,'author':user_name,'date':datetime.now().strftime("%Y-%m-%d"),'views':0,'content':dcont,'file_attached':dfile is not None})
                     st.success(f"✅ '{dt}' 등록 완료!")
                 else: st.error("⚠️ 필수 항목을 입력해주세요")